@@ -0,0 +1,92 @@
+"""Сжатие ответов: gzip и, если установлен пакет brotli, br."""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# В порядке предпочтения при равных q в Accept-Encoding.
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(request):
+    """Лучшее из поддерживаемых сжатий, принимаемых клиентом, или None."""
+    codings = parse_accept_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', '')
+    )
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = codings.get(encoding, codings.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def get_compressor(encoding):
+    """Пара функций (сжать порцию, завершить поток)."""
+    level = settings.API_COMPRESSION_LEVELS[encoding]
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+    # wbits=31 — формат gzip (заголовок с нулевым mtime).
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress_content(content, encoding):
+    """Сжатое содержимое или None, если сжимать не стоит.
+
+    Не сжимаются ответы меньше API_COMPRESSION_MIN_SIZE и ответы, которые
+    от сжатия не становятся короче.
+    """
+    if len(content) < settings.API_COMPRESSION_MIN_SIZE:
+        return None
+    process, finish = get_compressor(encoding)
+    compressed = process(content) + finish()
+    if len(compressed) >= len(content):
+        return None
+    return compressed
+
+
+def compress_sequence(sequence, encoding):
+    process, finish = get_compressor(encoding)
+    for item in sequence:
+        data = process(item)
+        if data:
+            yield data
+    yield finish()
+
+
+def set_encoding(response, encoding, content=None):
+    """Помечает ответ как сжатый; ``content`` — уже сжатое тело."""
+    if content is not None:
+        response.content = content
+        response['Content-Length'] = str(len(content))
+    # Сильный ETag относится к несжатому телу (RFC 7232, раздел 2.1).
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .compression import (choose_encoding, compress_content,
+                          compress_sequence, set_encoding)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжатие ответов gzip или brotli по Accept-Encoding.
+
+    В отличие от GZipMiddleware, порог размера задаётся настройкой
+    API_COMPRESSION_MIN_SIZE, а уже сжатые ответы (например, из кэша
+    ответов API) пропускаются без повторного сжатия.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.API_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+            set_encoding(response, encoding)
+            return response
+        compressed = compress_content(response.content, encoding)
+        if compressed is not None:
+            set_encoding(response, encoding, compressed)
+        return response
@@ -0,0 +1,43 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.v1.cache import bump_on_commit
+from api.v1.postings import POSTINGS_VERSION
+from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.queue import aggregates_updated
+from users.models import User
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=User)
+def bump_model_version(sender, **kwargs):
+    bump_on_commit(sender._meta.model_name)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_title_genre_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_on_commit(Title._meta.model_name, POSTINGS_VERSION)
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+def bump_postings_version(sender, **kwargs):
+    bump_on_commit(POSTINGS_VERSION)
+
+
+@receiver(aggregates_updated)
+def bump_aggregates_version(sender, **kwargs):
+    # Отправляется командами aggregates_worker и rebuild_rankings из
+    # своих процессов; веб-серверы видят версию через базу данных.
+    bump_on_commit(Title._meta.model_name)
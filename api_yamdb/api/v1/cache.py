@@ -0,0 +1,329 @@
+import hashlib
+import threading
+import time
+from calendar import timegm
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.compression import choose_encoding, compress_content, set_encoding
+from reviews.models import DataVersion
+
+VERSION_KEY = 'api:version:{}'
+
+
+def new_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    """Версии моделей из таблицы DataVersion.
+
+    Прочитанные версии кэшируются на API_VERSIONS_MAX_AGE секунд, так
+    что изменения из других процессов становятся видны не позже этого
+    срока даже с LocMemCache.
+    """
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = [
+        name for name, key in zip(names, keys) if key not in versions
+    ]
+    if missing:
+        loaded = {
+            VERSION_KEY.format(name): version
+            for name, version in load_versions(missing).items()
+        }
+        cache.set_many(loaded, timeout=settings.API_VERSIONS_MAX_AGE)
+        versions.update(loaded)
+    return [versions[key] for key in keys]
+
+
+def load_versions(names):
+    """Версии из базы данных; у ни разу не изменённой модели — 0."""
+    versions = dict.fromkeys(names, 0)
+    versions.update(
+        DataVersion.objects.filter(name__in=names).values_list(
+            'name', 'version'
+        )
+    )
+    return versions
+
+
+def bump_versions(names):
+    """Увеличивает версии моделей.
+
+    Версия — время последнего изменения в миллисекундах, но не меньше
+    предыдущей версии плюс один. Поэтому она годится и для
+    Last-Modified и не повторяется. Новые версии перечитываются и
+    кладутся в кэш здесь, на пути записи, чтобы чтения этого процесса
+    не ходили за ними в базу.
+    """
+    names = sorted(set(names))
+    rows = DataVersion.objects.filter(name__in=names)
+    version = new_version()
+    updated = rows.update(version=Greatest(F('version') + 1, Value(version)))
+    if updated < len(names):
+        DataVersion.objects.bulk_create(
+            [DataVersion(name=name, version=version) for name in names],
+            ignore_conflicts=True,
+        )
+    cache.set_many(
+        {
+            VERSION_KEY.format(name): value
+            for name, value in rows.values_list('name', 'version')
+        },
+        timeout=settings.API_VERSIONS_MAX_AGE,
+    )
+
+
+def bump_on_commit(*names):
+    """Увеличивает версии после фиксации текущей транзакции.
+
+    Иначе параллельный запрос может прочитать новую версию вместе со
+    старыми данными и закэшировать их под новым ключом.
+    """
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+def get_or_set_versioned(name, versions, compute):
+    """Данные, вычисленные ``compute`` при заданных версиях моделей.
+
+    Ключ включает версии, поэтому после изменения зависимостей данные
+    пересчитываются без явной инвалидации.
+    """
+    digest = hashlib.md5(repr(sorted(versions.items())).encode()).hexdigest()
+    key = f'api:data:{name}:{digest}'
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.API_CACHE_TIMEOUT)
+    return data
+
+
+class ProcessLocalData:
+    """Данные в памяти процесса, перестраиваемые методом ``build``.
+
+    Данные перестраиваются только когда меняется версия
+    ``version_name``. Версии хранятся в базе данных, поэтому изменения
+    из других процессов видны не позже, чем через API_VERSIONS_MAX_AGE,
+    а неизменные данные не перестраиваются.
+    """
+    version_name = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.data = None
+
+    def get_data(self):
+        version, = get_versions((self.version_name,))
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.data = self.build()
+                    self.version = version
+        return self.data
+
+    def build(self):
+        raise NotImplementedError
+
+
+class CachedResponseMixin:
+    """Условные ответы и кэш готовых ответов для GET-запросов.
+
+    ETag и Last-Modified считаются по версиям моделей из
+    ``cache_dependencies`` (для отдельного объекта — ещё и по его
+    ``updated_at``) до сериализации, так что 304 обходится без неё.
+    Ответы анонимным пользователям, кроме HTML, кэшируются целиком;
+    ключ включает нормализованные параметры запроса, тип ответа с
+    параметрами (например, indent) и те же версии.
+    Вместе с ответом хранятся его сжатые варианты, поэтому попадание в
+    кэш не сжимает ответ заново.
+    """
+    cache_dependencies = ()
+    cached_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_cache_key = None
+        self.etag = self.last_modified = None
+        self.versions = None
+        self.encoded = None
+        if (
+            request.method != 'GET'
+            or self.action not in self.cached_actions
+        ):
+            return
+        self.versions = dict(zip(
+            self.cache_dependencies, get_versions(self.cache_dependencies)
+        ))
+        # HTML Browsable API содержит CSRF-токен клиента и не кэшируется.
+        if (
+            request.user.is_anonymous
+            and request.accepted_renderer.media_type != 'text/html'
+        ):
+            self.response_cache_key = self.get_response_cache_key(
+                request, self.versions
+            )
+
+    def get_validators(self, request, versions):
+        parts = [
+            request.path,
+            request.accepted_media_type,
+            request.user.pk,
+            self.get_query_string(request),
+        ]
+        modified = [
+            version / 1000 for version in versions.values() if version
+        ]
+        if self.action == 'retrieve':
+            updated_at = self.get_object_updated_at()
+            if updated_at is None:
+                return None, None
+            own = self.get_queryset().model._meta.model_name
+            parts.append(updated_at.isoformat())
+            parts.append(sorted(
+                (name, version) for name, version in versions.items()
+                if name != own
+            ))
+            modified = [
+                versions[name] / 1000 for name in versions
+                if name != own and versions[name]
+            ]
+            modified.append(timegm(updated_at.utctimetuple()))
+        else:
+            parts.append(sorted(versions.items()))
+        etag = quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+        return etag, int(max(modified)) if modified else None
+
+    def get_object_updated_at(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        model = self.get_queryset().model
+        try:
+            return model.objects.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).order_by().values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    @staticmethod
+    def get_query_string(request):
+        query = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params
+        )
+        return urlencode(query, doseq=True)
+
+    def get_response_cache_key(self, request, versions):
+        parts = (
+            request.scheme,
+            request.get_host(),
+            request.path,
+            request.accepted_media_type,
+            self.get_query_string(request),
+            sorted(versions.items()),
+        )
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return f'api:response:{self.basename}:{digest}'
+
+    def get_cached_response(self, request):
+        """Возвращает 304, ответ из кэша или None.
+
+        Валидаторы закэшированного ответа хранятся вместе с ним, поэтому
+        попадание в кэш обходится без запросов к базе данных.
+        """
+        if self.versions is None:
+            return None
+        cached = None
+        if self.response_cache_key:
+            cached = cache.get(self.response_cache_key)
+        if cached is not None:
+            (
+                content, content_type, self.etag, self.last_modified,
+                variants,
+            ) = cached
+        else:
+            self.etag, self.last_modified = self.get_validators(
+                request, self.versions
+            )
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None or cached is None:
+            return response
+        encoding = choose_encoding(request)
+        if encoding is not None and encoding not in variants:
+            # None запоминает, что этот вариант сжимать не стоит.
+            variants[encoding] = compress_content(content, encoding)
+            cache.set(
+                self.response_cache_key, cached, settings.API_CACHE_TIMEOUT
+            )
+        if variants.get(encoding) is not None:
+            self.encoded = encoding, variants[encoding]
+        return HttpResponse(content, content_type=content_type)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(self, 'etag', None) and (
+            response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+            )
+        ):
+            response['ETag'] = self.etag
+            if self.last_modified is not None:
+                response['Last-Modified'] = http_date(self.last_modified)
+        if (
+            getattr(self, 'response_cache_key', None)
+            and isinstance(response, Response)
+            and response.status_code == status.HTTP_200_OK
+        ):
+            response.render()
+            variants = {}
+            encoding = choose_encoding(request)
+            if encoding is not None:
+                variants[encoding] = compress_content(
+                    response.content, encoding
+                )
+            cache.set(
+                self.response_cache_key,
+                (
+                    response.content, response['Content-Type'],
+                    self.etag, self.last_modified, variants,
+                ),
+                settings.API_CACHE_TIMEOUT,
+            )
+            if variants.get(encoding) is not None:
+                self.encoded = encoding, variants[encoding]
+        if getattr(self, 'encoded', None):
+            set_encoding(response, *self.encoded)
+        return response
+
+
+class CachedListMixin(CachedResponseMixin):
+
+    def list(self, request, *args, **kwargs):
+        response = self.get_cached_response(request)
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.get_cached_response(request)
+        if response is not None:
+            return response
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,55 @@
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils import encoders
+
+
+def dumps(data):
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False,
+        separators=(',', ':'),
+    ) + '\n'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Один JSON-объект на строку (newline-delimited JSON)."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data).encode(self.charset)
+
+
+def stream_rows(fast_serializer, queryset, chunk_size=None):
+    """Строки NDJSON для выборки, прочитанной порциями.
+
+    Память не зависит от размера выборки: строки читаются через
+    iterator(), а связанные данные (жанры) запрашиваются на каждую
+    порцию из ``chunk_size`` строк.
+    """
+    chunk_size = chunk_size or settings.API_EXPORT_CHUNK_SIZE
+    rows = fast_serializer.prepare(queryset).order_by('pk').iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield ''.join(map(dumps, fast_serializer.represent(chunk)))
+
+
+def ndjson_response(fast_serializer, queryset, filename):
+    response = StreamingHttpResponse(
+        stream_rows(fast_serializer, queryset),
+        content_type=f'{NDJSONRenderer.media_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.ndjson"'
+    )
+    return response
@@ -0,0 +1,140 @@
+from rest_framework import serializers
+
+from reviews.models import Genre, Title
+
+from .serializers import (CategorySerializer, CommentSerializer,
+                          GenreSerializer, ReviewSerializer,
+                          TitleReadSerializer)
+
+
+class FastListSerializer:
+    """Сериализация списков напрямую из строк values().
+
+    Повторяет вывод ``model_serializer`` (порядок и формат полей, учёт
+    ?fields=/?omit=), но не создаёт ни экземпляров моделей, ни полей
+    DRF на каждую строку. ``columns`` сопоставляет поле ответа с
+    выражениями values(); вложенные объекты собираются в ``represent``.
+    """
+    model_serializer = None
+    columns = {}
+    datetime_fields = ()
+
+    def __init__(self, request, view):
+        self.request = request
+        self.view = view
+        field_names = self.model_serializer.Meta.fields
+        selected = self.model_serializer.get_sparse_fields(
+            request, field_names
+        )
+        self.fields = [
+            name for name in field_names
+            if selected is None or name in selected
+        ]
+        self.datetime_field = serializers.DateTimeField()
+
+    def get_values(self):
+        values = ['pk']
+        for name in self.fields:
+            values.extend(self.columns.get(name, ()))
+        values.extend(
+            name.lstrip('-')
+            for name in getattr(self.view, 'cursor_ordering', ())
+        )
+        values.extend(getattr(self.view, 'ordering_fields', None) or ())
+        return list(dict.fromkeys(values))
+
+    def prepare(self, queryset):
+        return queryset.select_related(None).prefetch_related(None).values(
+            *self.get_values()
+        )
+
+    def represent(self, rows):
+        to_datetime = self.datetime_field.to_representation
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.fields:
+                column = self.columns[name][0]
+                value = row[column]
+                if name in self.datetime_fields and value is not None:
+                    value = to_datetime(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+
+class FastCategorySerializer(FastListSerializer):
+    model_serializer = CategorySerializer
+    columns = {'name': ('name',), 'slug': ('slug',)}
+
+
+class FastGenreSerializer(FastListSerializer):
+    model_serializer = GenreSerializer
+    columns = {'name': ('name',), 'slug': ('slug',)}
+
+
+class FastTitleSerializer(FastListSerializer):
+    model_serializer = TitleReadSerializer
+    columns = {
+        'id': ('id',),
+        'name': ('name',),
+        'year': ('year',),
+        'rating': ('rating',),
+        'description': ('description',),
+        'genre': (),
+        'category': ('category_id', 'category__name', 'category__slug'),
+    }
+
+    def get_genres(self, rows):
+        genres = {row['pk']: [] for row in rows}
+        links = Title.genre.through.objects.filter(
+            title_id__in=list(genres)
+        ).order_by(
+            *(f'genre__{name}' for name in Genre._meta.ordering)
+        ).values_list('title_id', 'genre__name', 'genre__slug')
+        for title_id, name, slug in links:
+            genres[title_id].append({'name': name, 'slug': slug})
+        return genres
+
+    def represent(self, rows):
+        genres = self.get_genres(rows) if 'genre' in self.fields else {}
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.fields:
+                if name == 'genre':
+                    item[name] = genres[row['pk']]
+                elif name == 'category':
+                    item[name] = None if row['category_id'] is None else {
+                        'name': row['category__name'],
+                        'slug': row['category__slug'],
+                    }
+                else:
+                    item[name] = row[name]
+            data.append(item)
+        return data
+
+
+class FastReviewSerializer(FastListSerializer):
+    model_serializer = ReviewSerializer
+    columns = {
+        'id': ('id',),
+        'title': ('title__name',),
+        'text': ('text',),
+        'author': ('author__username',),
+        'score': ('score',),
+        'pub_date': ('pub_date',),
+    }
+    datetime_fields = ('pub_date',)
+
+
+class FastCommentSerializer(FastListSerializer):
+    model_serializer = CommentSerializer
+    columns = {
+        'id': ('id',),
+        'text': ('text',),
+        'author': ('author__username',),
+        'pub_date': ('pub_date',),
+        'review': ('review__text',),
+    }
+    datetime_fields = ('pub_date',)
@@ -1,5 +1,46 @@
+import json
+import re
+
+from django import forms
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
 from django_filters import rest_framework
 from reviews.models import Title
+from reviews.search import TITLE_SEARCH_TABLE
+
+from .postings import genre_postings
+from .slugs import category_slugs, genre_slugs
+
+MAX_YEAR = 9999
+
+GENRE_MODE_ANY = 'any'
+GENRE_MODE_ALL = 'all'
+GENRE_MODES = (
+    (GENRE_MODE_ANY, GENRE_MODE_ANY),
+    (GENRE_MODE_ALL, GENRE_MODE_ALL),
+)
+
+
+def fts_query(value):
+    """Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово ищется как префикс, слова объединяются через AND.
+    """
+    words = re.findall(r'\w+', value)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class YearFilter(rest_framework.NumberFilter):
+    """Целый год в пределах MAX_YEAR: за пределами — ошибка 400, а не
+    переполнение целого в запросе к базе данных."""
+    field_class = forms.IntegerField
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('min_value', 0)
+        kwargs.setdefault('max_value', MAX_YEAR)
+        super().__init__(*args, **kwargs)
 
 
 class TitleFilter(rest_framework.FilterSet):
@@ -8,19 +49,104 @@ class TitleFilter(rest_framework.FilterSet):
         field_name='name',
         lookup_expr='icontains'
     )
-    year = rest_framework.NumberFilter(
+    year = YearFilter(
         field_name='year',
-        lookup_expr='icontains'
-    )
-    category = rest_framework.CharFilter(
-        field_name='category__slug',
         lookup_expr='exact'
     )
-    genre = rest_framework.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='exact'
+    year_min = YearFilter(
+        field_name='year',
+        lookup_expr='gte'
+    )
+    year_max = YearFilter(
+        field_name='year',
+        lookup_expr='lte'
+    )
+    category = rest_framework.CharFilter(method='filter_category')
+    genre = rest_framework.CharFilter(method='filter_genre')
+    genre_mode = rest_framework.ChoiceFilter(
+        choices=GENRE_MODES,
+        method='filter_genre_mode'
     )
+    search = rest_framework.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('name', 'year', 'category', 'genre',)
+        fields = (
+            'name', 'year', 'year_min', 'year_max', 'category', 'genre',
+            'genre_mode', 'search',
+        )
+
+    category_field = 'category_id'
+
+    def filter_category(self, queryset, name, value):
+        category_id = category_slugs.get_id(value)
+        if category_id is None:
+            return queryset.none()
+        return queryset.filter(**{self.category_field: category_id})
+
+    def filter_genre(self, queryset, name, value):
+        slugs = [slug.strip() for slug in value.split(',') if slug.strip()]
+        if not slugs:
+            return queryset
+        match_all = self.form.cleaned_data.get('genre_mode') == GENRE_MODE_ALL
+        ids = genre_postings.match(
+            slugs, match_all=match_all,
+            limit=settings.API_GENRE_FILTER_MAX_IDS,
+        )
+        if ids is None:
+            return queryset.filter(
+                pk__in=self.genre_subquery(slugs, match_all)
+            )
+        if connection.vendor == 'sqlite':
+            # Один параметр вместо тысяч: список id передаётся как JSON.
+            return queryset.filter(pk__in=RawSQL(
+                'SELECT value FROM json_each(%s)', [json.dumps(ids)]
+            ))
+        return queryset.filter(pk__in=ids)
+
+    @staticmethod
+    def genre_subquery(slugs, match_all):
+        """id произведений жанров ``slugs`` по промежуточной таблице."""
+        genre_ids = {genre_slugs.get_id(slug) for slug in slugs}
+        rows = Title.genre.through.objects.filter(
+            genre_id__in=genre_ids - {None}
+        )
+        if not match_all:
+            return rows.values('title_id')
+        if None in genre_ids:
+            return rows.none().values('title_id')
+        return rows.values('title_id').annotate(
+            genre_count=Count('genre_id')
+        ).filter(genre_count=len(genre_ids)).values('title_id')
+
+    def filter_genre_mode(self, queryset, name, value):
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        query = fts_query(value)
+        if not query:
+            return queryset
+        if connection.vendor != 'sqlite':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(description__icontains=value)
+            )
+        table = Title._meta.db_table
+        # Соединение с таблицей FTS5: MATCH выполняется один раз, а rank
+        # читается из той же строки результата поиска.
+        return queryset.extra(
+            tables=[TITLE_SEARCH_TABLE],
+            where=[
+                f'{TITLE_SEARCH_TABLE} MATCH %s',
+                f'{TITLE_SEARCH_TABLE}.rowid = {table}.id',
+            ],
+            params=[query],
+            select={'search_rank': f'{TITLE_SEARCH_TABLE}.rank'},
+            order_by=['search_rank', 'pk'],
+        )
+
+
+class TopTitleFilter(TitleFilter):
+    """Фильтры рейтинга: категория берётся из строки TitleRanking,
+    чтобы выборка шла по индексу (category, -score)."""
+
+    category_field = 'ranking__category_id'
@@ -0,0 +1,219 @@
+"""Кодирование MessagePack.
+
+Если пакет msgpack не установлен, используется реализация на чистом
+Python с тем же выводом, что и ``msgpack.packb(use_bin_type=True)``:
+nil, bool, целые до 64 бит, float64, str, bin, массивы и словари.
+Расширения (ext) не поддерживаются, вложенность при разборе ограничена
+MAX_DEPTH.
+"""
+import struct
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+def packb(data, default=None):
+    if msgpack is not None:
+        return msgpack.packb(data, default=default, use_bin_type=True)
+    chunks = []
+    pack_into(chunks, data, default)
+    return b''.join(chunks)
+
+
+def unpackb(content):
+    if msgpack is not None:
+        return msgpack.unpackb(content, raw=False)
+    value, offset = unpack_from(content, 0)
+    if offset != len(content):
+        raise ValueError('Лишние данные после значения.')
+    return value
+
+
+def pack_length(chunks, length, fix_base, fix_limit, formats):
+    if length < fix_limit:
+        chunks.append(bytes((fix_base | length,)))
+        return
+    for code, fmt in formats:
+        if length < 1 << (8 * struct.calcsize(fmt)):
+            chunks.append(bytes((code,)) + struct.pack(fmt, length))
+            return
+    raise ValueError('Слишком длинное значение для MessagePack.')
+
+
+def pack_int(chunks, value, default=None):
+    if 0 <= value < 0x80:
+        chunks.append(bytes((value,)))
+    elif -32 <= value < 0:
+        chunks.append(struct.pack('>b', value))
+    elif value >= 0:
+        for code, fmt in ((0xcc, '>B'), (0xcd, '>H'), (0xce, '>I'),
+                          (0xcf, '>Q')):
+            if value < 1 << (8 * struct.calcsize(fmt)):
+                chunks.append(bytes((code,)) + struct.pack(fmt, value))
+                return
+        raise OverflowError('Целое больше 64 бит.')
+    else:
+        for code, fmt in ((0xd0, '>b'), (0xd1, '>h'), (0xd2, '>i'),
+                          (0xd3, '>q')):
+            if value >= -(1 << (8 * struct.calcsize(fmt) - 1)):
+                chunks.append(bytes((code,)) + struct.pack(fmt, value))
+                return
+        raise OverflowError('Целое больше 64 бит.')
+
+
+def pack_float(chunks, value, default=None):
+    chunks.append(b'\xcb' + struct.pack('>d', value))
+
+
+def pack_str(chunks, value, default=None):
+    data = value.encode('utf-8')
+    pack_length(chunks, len(data), 0xa0, 32, (
+        (0xd9, '>B'), (0xda, '>H'), (0xdb, '>I'),
+    ))
+    chunks.append(data)
+
+
+def pack_bin(chunks, value, default=None):
+    data = bytes(value)
+    pack_length(chunks, len(data), 0, 0, (
+        (0xc4, '>B'), (0xc5, '>H'), (0xc6, '>I'),
+    ))
+    chunks.append(data)
+
+
+def pack_array(chunks, value, default):
+    pack_length(chunks, len(value), 0x90, 16, (
+        (0xdc, '>H'), (0xdd, '>I'),
+    ))
+    for item in value:
+        pack_into(chunks, item, default)
+
+
+def pack_map(chunks, value, default):
+    pack_length(chunks, len(value), 0x80, 16, (
+        (0xde, '>H'), (0xdf, '>I'),
+    ))
+    for key, item in value.items():
+        pack_into(chunks, key, default)
+        pack_into(chunks, item, default)
+
+
+# bool — подкласс int, поэтому константы проверяются раньше.
+CONSTANT_CODES = ((None, b'\xc0'), (True, b'\xc3'), (False, b'\xc2'))
+PACKERS = (
+    (int, pack_int),
+    (float, pack_float),
+    (str, pack_str),
+    ((bytes, bytearray, memoryview), pack_bin),
+    ((list, tuple), pack_array),
+    (dict, pack_map),
+)
+
+
+def pack_into(chunks, value, default, default_used=False):
+    for constant, code in CONSTANT_CODES:
+        if value is constant:
+            chunks.append(code)
+            return
+    for types, pack in PACKERS:
+        if isinstance(value, types):
+            pack(chunks, value, default)
+            return
+    if default is None or default_used:
+        raise TypeError(
+            f'Тип {type(value).__name__} не поддерживается MessagePack.'
+        )
+    # Как и в msgpack.packb, default применяется к значению один раз,
+    # но остаётся доступным для вложенных в его результат элементов.
+    pack_into(chunks, default(value), default, default_used=True)
+
+
+# Код формата: (формат struct длины или значения, вид значения).
+FORMATS = {
+    0xc4: ('>B', 'bin'), 0xc5: ('>H', 'bin'), 0xc6: ('>I', 'bin'),
+    0xca: ('>f', 'value'), 0xcb: ('>d', 'value'),
+    0xcc: ('>B', 'value'), 0xcd: ('>H', 'value'), 0xce: ('>I', 'value'),
+    0xcf: ('>Q', 'value'),
+    0xd0: ('>b', 'value'), 0xd1: ('>h', 'value'), 0xd2: ('>i', 'value'),
+    0xd3: ('>q', 'value'),
+    0xd9: ('>B', 'str'), 0xda: ('>H', 'str'), 0xdb: ('>I', 'str'),
+    0xdc: ('>H', 'array'), 0xdd: ('>I', 'array'),
+    0xde: ('>H', 'map'), 0xdf: ('>I', 'map'),
+}
+CONSTANTS = {0xc0: None, 0xc2: False, 0xc3: True}
+# Коды fix-форматов: (первый код, последний код, вид значения).
+FIX_FORMATS = (
+    (0xa0, 0xbf, 'str'), (0x90, 0x9f, 'array'), (0x80, 0x8f, 'map'),
+)
+# Наибольшая вложенность массивов и словарей при разборе; без неё
+# глубоко вложенное тело исчерпало бы стек рекурсии.
+MAX_DEPTH = 100
+
+
+def read(content, offset, size):
+    end = offset + size
+    if end > len(content):
+        raise ValueError('Неожиданный конец данных.')
+    return content[offset:end], end
+
+
+def read_header(content, offset, code):
+    """Вид значения, его длина (или само число) и смещение после них."""
+    for first, last, kind in FIX_FORMATS:
+        if first <= code <= last:
+            return kind, code - first, offset
+    if code not in FORMATS:
+        raise ValueError(f'Неподдерживаемый код формата 0x{code:02x}.')
+    fmt, kind = FORMATS[code]
+    data, offset = read(content, offset, struct.calcsize(fmt))
+    return kind, struct.unpack(fmt, data)[0], offset
+
+
+def unpack_str(content, offset, length, depth):
+    data, offset = read(content, offset, length)
+    return data.decode('utf-8'), offset
+
+
+def unpack_bin(content, offset, length, depth):
+    return read(content, offset, length)
+
+
+def unpack_array(content, offset, length, depth):
+    items = []
+    for _ in range(length):
+        item, offset = unpack_from(content, offset, depth + 1)
+        items.append(item)
+    return items, offset
+
+
+def unpack_map(content, offset, length, depth):
+    result = {}
+    for _ in range(length):
+        key, offset = unpack_from(content, offset, depth + 1)
+        result[key], offset = unpack_from(content, offset, depth + 1)
+    return result, offset
+
+
+UNPACKERS = {
+    'str': unpack_str, 'bin': unpack_bin,
+    'array': unpack_array, 'map': unpack_map,
+}
+
+
+def unpack_from(content, offset, depth=0):
+    if depth > MAX_DEPTH:
+        raise ValueError('Слишком глубокая вложенность.')
+    data, offset = read(content, offset, 1)
+    code = data[0]
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if code in CONSTANTS:
+        return CONSTANTS[code], offset
+    kind, length, offset = read_header(content, offset, code)
+    if kind == 'value':
+        return length, offset
+    return UNPACKERS[kind](content, offset, length, depth)
@@ -0,0 +1,411 @@
+import base64
+import binascii
+import datetime as dt
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import get_versions
+
+# Диапазон целых чисел, которые помещаются в колонку базы данных.
+INTEGER_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """Limit/offset по умолчанию и курсорный (keyset) режим по запросу.
+
+    Курсорный режим включается параметром ``?pagination=cursor`` и
+    продолжается по ссылкам ``next``/``previous`` с параметром ``cursor``.
+    Вместо OFFSET страница выбирается условием по значениям полей
+    сортировки последней строки, поэтому её стоимость не зависит от
+    глубины. Порядок задаётся атрибутом ``cursor_ordering`` вьюсета,
+    уникальность обеспечивается добавлением ``pk`` в конец, если среди
+    полей сортировки нет уникального.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    cursor_mode_value = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+    cursor_template = 'rest_framework/pagination/previous_and_next.html'
+
+    def use_cursor(self, request, view):
+        if not getattr(view, 'cursor_ordering', None):
+            return False
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param)
+            == self.cursor_mode_value
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request, view)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_cursor_ordering(request, queryset, view)
+        reverse, position = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, position))
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        if (self.has_next or self.has_previous) and self.template is not None:
+            self.display_page_controls = True
+        return results
+
+    def get_cursor_ordering(self, request, queryset, view):
+        ordering = None
+        if OrderingFilter in getattr(view, 'filter_backends', ()):
+            if request.query_params.get(OrderingFilter.ordering_param):
+                ordering = OrderingFilter().get_ordering(
+                    request, queryset, view
+                )
+        ordering = list(ordering or view.cursor_ordering)
+        if not any(
+            self.get_model_field(queryset.model, field).unique
+            for field in ordering
+        ):
+            ordering.append('pk')
+        return ordering
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def keyset_filter(ordering, position):
+        """Условие «строго после position» для составного порядка.
+
+        Избыточная граница по первому полю позволяет базе данных начать
+        просмотр индекса прямо с неё, а не отбрасывать строки по OR.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        field, value = ordering[0], position[0]
+        if len(ordering) > 1 and value is not None:
+            lookup = 'lte' if field.startswith('-') else 'gte'
+            condition &= Q(**{f'{field.lstrip("-")}__{lookup}': value})
+        return condition
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = instance
+                for attr in name.split('__'):
+                    value = getattr(value, attr)
+            if isinstance(value, (dt.date, dt.datetime)):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def encode_cursor(self, reverse, position):
+        data = json.dumps([int(reverse), position], ensure_ascii=False)
+        cursor = base64.urlsafe_b64encode(data.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        url = remove_query_param(url, self.offset_query_param)
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+        try:
+            reverse, position = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()).decode()
+            )
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self.clean_position_value(model, field, value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (
+            TypeError, ValueError, OverflowError, ValidationError,
+            FieldDoesNotExist,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), position
+
+    @staticmethod
+    def get_model_field(model, field):
+        *relations, name = field.lstrip('-').split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    @staticmethod
+    def clean_position_value(model, field, value):
+        """Приводит значение курсора к типу поля сортировки.
+
+        Значение из запроса проверяется валидаторами поля и на диапазон
+        целых чисел базы данных, чтобы подделанный курсор не доходил до
+        запроса.
+        """
+        model_field = KeysetPagination.get_model_field(model, field)
+        value = model_field.to_python(value)
+        model_field.run_validators(value)
+        if isinstance(value, int) and not (
+            INTEGER_RANGE[0] <= value <= INTEGER_RANGE[1]
+        ):
+            raise OverflowError(value)
+        return value
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_html_context(self):
+        if not self.cursor_mode:
+            return super().get_html_context()
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link(),
+        }
+
+    def to_html(self):
+        if self.cursor_mode:
+            self.template = self.cursor_template
+        return super().to_html()
+
+
+class FeedPagination(KeysetPagination):
+    """Только курсорная пагинация — для лент без подсчёта записей."""
+
+    def use_cursor(self, request, view):
+        return bool(getattr(view, 'cursor_ordering', None))
+
+
+LARGE_TABLE_KEY = 'api:count:large:{}'
+
+
+def estimate_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике планировщика или None."""
+    table = model._meta.db_table
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [table]
+                )
+            elif connection.vendor == 'sqlite':
+                # sqlite_stat1 появляется после ANALYZE.
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table]
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    value = row[0]
+    if isinstance(value, str):
+        value = value.split()[0]
+    value = int(float(value))
+    return value if value >= 0 else None
+
+
+class CachedCountPagination(KeysetPagination):
+    """Пагинация без лишних COUNT(*).
+
+    Число записей кэшируется по пути, параметрам фильтрации и версиям
+    моделей (``cache_dependencies`` вьюсета или модель выборки). Для
+    выборки без условий из таблицы больше API_COUNT_ESTIMATE_THRESHOLD
+    строк отдаётся оценка по статистике базы данных. С ``?count=false``
+    подсчёт не выполняется: в ответе нет ``count``, а наличие следующей
+    страницы определяется лишней строкой выборки.
+    """
+    count_query_param = 'count'
+    count_false_values = ('false', '0', 'no')
+    # Параметры, не влияющие на число записей.
+    count_ignored_params = (
+        'limit', 'offset', 'cursor', 'pagination', 'count', 'ordering',
+        'fields', 'omit', 'format',
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.with_count = request.query_params.get(
+            self.count_query_param, ''
+        ).lower() not in self.count_false_values
+        if self.with_count or self.use_cursor(request, view):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_mode = False
+        self.count = None
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        if (
+            (self.has_next or self.offset)
+            and self.template is not None
+        ):
+            self.display_page_controls = True
+        return results[:self.limit]
+
+    def get_count(self, queryset):
+        key = self.get_count_cache_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            count = self.get_estimated_count(queryset)
+        if count is None:
+            count = super().get_count(queryset)
+            if not self.is_filtered(queryset):
+                cache.set(
+                    LARGE_TABLE_KEY.format(queryset.model._meta.db_table),
+                    count >= settings.API_COUNT_ESTIMATE_THRESHOLD,
+                    timeout=None,
+                )
+        cache.set(key, count, settings.API_CACHE_TIMEOUT)
+        return count
+
+    @staticmethod
+    def is_filtered(queryset):
+        return bool(queryset.query.where or queryset.query.distinct)
+
+    def get_estimated_count(self, queryset):
+        """Оценка для выборки без условий из заведомо большой таблицы.
+
+        Таблица считается большой, если прошлый точный подсчёт её строк
+        достиг порога, поэтому для небольших таблиц статистика базы не
+        запрашивается.
+        """
+        if self.is_filtered(queryset) or not cache.get(
+            LARGE_TABLE_KEY.format(queryset.model._meta.db_table)
+        ):
+            return None
+        estimate = estimate_count(queryset.model, queryset.db)
+        if (
+            estimate is None
+            or estimate < settings.API_COUNT_ESTIMATE_THRESHOLD
+        ):
+            return None
+        return estimate
+
+    def get_count_cache_key(self, queryset):
+        params = self.request.query_params
+        query = sorted(
+            (key, sorted(params.getlist(key))) for key in params
+            if key not in self.count_ignored_params
+        )
+        names = getattr(self.view, 'cache_dependencies', None) or (
+            queryset.model._meta.model_name,
+        )
+        parts = (
+            self.request.path,
+            query,
+            sorted(zip(names, get_versions(names))),
+        )
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return f'api:count:{digest}'
+
+    def get_next_link(self):
+        if self.cursor_mode or self.with_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_mode or self.with_count:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_html_context(self):
+        if self.cursor_mode or self.with_count:
+            return super().get_html_context()
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link(),
+        }
+
+    def to_html(self):
+        if not self.cursor_mode and not self.with_count:
+            self.template = self.cursor_template
+        return super().to_html()
@@ -0,0 +1,15 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .messagepack import unpackb
+
+
+class MessagePackParser(BaseParser):
+    """Тело запроса в MessagePack (``Content-Type: application/msgpack``)."""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpackb(stream.read())
+        except (ValueError, TypeError) as exc:
+            raise ParseError(f'Ошибка разбора MessagePack: {exc}')
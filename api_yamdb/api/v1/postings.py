@@ -0,0 +1,86 @@
+from array import array
+from bisect import bisect_left
+
+from reviews.models import Title
+
+from .cache import ProcessLocalData
+from .slugs import genre_slugs
+
+POSTINGS_VERSION = 'titlegenre'
+
+
+def intersect(postings):
+    """Пересечение отсортированных массивов id.
+
+    Перебирается самый короткий массив, в остальных id ищутся бинарным
+    поиском от предыдущей найденной позиции, поэтому стоимость зависит
+    от его длины, а не от размера каталога.
+    """
+    smallest, *others = sorted(postings, key=len)
+    result = list(smallest)
+    for ids in others:
+        matched = []
+        index = 0
+        for title_id in result:
+            index = bisect_left(ids, title_id, index)
+            if index == len(ids):
+                break
+            if ids[index] == title_id:
+                matched.append(title_id)
+        result = matched
+    return result
+
+
+def union(postings):
+    if len(postings) == 1:
+        return list(postings[0])
+    return sorted(set().union(*postings))
+
+
+class GenrePostings(ProcessLocalData):
+    """Инвертированный индекс «id жанра → отсортированный массив id».
+
+    Индекс хранится в памяти процесса и перестраивается одним запросом к
+    промежуточной таблице Title.genre, когда меняется версия
+    ``titlegenre`` (её увеличивают сигналы после фиксации изменений
+    жанров произведения и его удаления). Слаги переводятся в id через
+    ``genre_slugs``. Пересечение жанров начинается с самого короткого
+    массива, объединение стоит порядка размера результата.
+    """
+    version_name = POSTINGS_VERSION
+
+    def get_postings(self):
+        return self.get_data()
+
+    @staticmethod
+    def build():
+        ids = {}
+        rows = Title.genre.through.objects.order_by(
+            'genre_id', 'title_id'
+        ).values_list('genre_id', 'title_id')
+        for genre_id, title_id in rows.iterator():
+            ids.setdefault(genre_id, array('q')).append(title_id)
+        return ids
+
+    def match(self, slugs, match_all=False, limit=None):
+        """Отсортированные id произведений жанров ``slugs``.
+
+        Возвращает None, если результат может оказаться длиннее
+        ``limit``: такой фильтр дешевле выполнить в базе данных, чем
+        передавать ей список id.
+        """
+        postings = self.get_postings()
+        empty = array('q')
+        lists = [
+            postings.get(genre_slugs.get_id(slug), empty) for slug in slugs
+        ]
+        if match_all:
+            if limit is not None and min(map(len, lists)) > limit:
+                return None
+            return intersect(lists)
+        if limit is not None and sum(map(len, lists)) > limit:
+            return None
+        return union(lists)
+
+
+genre_postings = GenrePostings()
@@ -0,0 +1,94 @@
+import re
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+from .messagepack import packb
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Показатель степени числа: orjson пишет 1e16 и 1e-6 там, где json
+# пишет 1e+16 и 1e-06.
+EXPONENT = re.compile(rb'e-?[0-9]')
+DIGITS = frozenset(b'0123456789')
+
+
+def differs_from_json(content):
+    """Может ли вывод orjson отличаться от вывода json.
+
+    Кроме показателя степени, orjson пишет 0.000025 вместо 2.5e-05.
+    Такие же сочетания внутри строк дают ложное срабатывание, и ответ
+    просто отрисовывается медленным путём.
+    """
+    if b'0.0000' in content:
+        return True
+    return any(
+        content[match.start() - 1] in DIGITS
+        for match in EXPONENT.finditer(content, 1)
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer, кодирующий ответ через orjson.
+
+    Даты и Decimal приводятся тем же ``encoder_class``, что и в
+    JSONRenderer, поэтому вывод побайтно совпадает с ним. Ответы с
+    отступами, с ``ensure_ascii``, с числами, которые orjson записывает
+    иначе, или без установленного orjson отрисовываются родительским
+    классом.
+    """
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson else 0
+    )
+
+    def __init__(self):
+        self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except TypeError:
+            # Например, целые больше 64 бит.
+            return super().render(data, accepted_media_type, renderer_context)
+        if differs_from_json(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80' in ret:
+            # Как и JSONRenderer, экранируем \u2028 и \u2029.
+            ret = ret.replace(
+                b'\xe2\x80\xa8', b'\\u2028'
+            ).replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в MessagePack (``Accept: application/msgpack``).
+
+    Структура та же, что у JSON: даты, Decimal и прочие типы приводятся
+    кодировщиком JSONRenderer.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def __init__(self):
+        self.default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data, default=self.default)
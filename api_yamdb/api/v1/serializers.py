@@ -1,10 +1,65 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
-from django.core.exceptions import ValidationError
-from django.shortcuts import get_object_or_404
-from reviews.models import (Category, Comment, Genre, Review, Title)
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from reviews.models import (SCORES, Category, Comment, Genre, Review,
+                            Title)
+from reviews.ranking import sync_ranking_categories
 from users.models import User, CHOICES
+from .cache import bump_on_commit
+from .postings import POSTINGS_VERSION
+from .slugs import category_slugs, genre_slugs
 import datetime as dt
+from collections import OrderedDict
+
+# Наибольший id, который помещается в целое SQLite (BigAutoField).
+MAX_TITLE_ID = 2 ** 63 - 1
+
+
+class SparseFieldsetMixin:
+    """Позволяет выбрать поля ответа параметрами ?fields= и ?omit=.
+
+    Действует только на GET-запросы и только на корневой сериализатор
+    (или элемент списка), вложенные сериализаторы не затрагиваются.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    @classmethod
+    def get_sparse_fields(cls, request, available):
+        if request is None or request.method != 'GET':
+            return None
+        params = request.query_params
+        if not (
+            cls.fields_query_param in params
+            or cls.omit_query_param in params
+        ):
+            return None
+        selected = set(available)
+        if params.get(cls.fields_query_param):
+            selected &= set(params[cls.fields_query_param].split(','))
+        if params.get(cls.omit_query_param):
+            selected -= set(params[cls.omit_query_param].split(','))
+        return selected
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_root():
+            return fields
+        selected = self.get_sparse_fields(self.context.get('request'), fields)
+        if selected is None:
+            return fields
+        return OrderedDict(
+            (name, field) for name, field in fields.items()
+            if name in selected
+        )
 
 
 def valid_name(name):
@@ -17,7 +72,7 @@ def valid_name(name):
     return name
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     role = serializers.ChoiceField(choices=CHOICES, default='user')
 
     class Meta:
@@ -99,21 +154,34 @@ class CreateTokenSerializer(serializers.Serializer):
         return data
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = ('name', 'slug')
         model = Category
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     class Meta:
         fields = ('name', 'slug')
         model = Genre
 
 
-class TitleReadSerializer(serializers.ModelSerializer):
+class CatalogStatsSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    slug = serializers.SlugField()
+    title_count = serializers.IntegerField()
+    review_count = serializers.IntegerField()
+    mean_score = serializers.SerializerMethodField()
+
+    def get_mean_score(self, row):
+        if not row['review_count']:
+            return None
+        return round(row['score_sum'] / row['review_count'], 2)
+
+
+class TitleReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategorySerializer(many=False, required=True)
     genre = GenreSerializer(many=True, required=False)
     rating = serializers.IntegerField(read_only=True)
@@ -125,12 +193,54 @@ class TitleReadSerializer(serializers.ModelSerializer):
         )
 
 
+class TitleDetailSerializer(TitleReadSerializer):
+    score_distribution = serializers.SerializerMethodField()
+
+    class Meta(TitleReadSerializer.Meta):
+        fields = TitleReadSerializer.Meta.fields + ('score_distribution',)
+
+    def get_score_distribution(self, title):
+        histogram = getattr(title, 'score_histogram', None)
+        if histogram is None:
+            return {str(score): 0 for score in SCORES}
+        return histogram.distribution()
+
+
+class TopTitleSerializer(TitleReadSerializer):
+    weighted_rating = serializers.FloatField(
+        source='ranking.score', read_only=True
+    )
+
+    class Meta(TitleReadSerializer.Meta):
+        fields = TitleReadSerializer.Meta.fields + ('weighted_rating',)
+
+
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField, который ищет слаг в SlugMap без запроса к базе."""
+
+    def __init__(self, slug_map=None, **kwargs):
+        self.slug_map = slug_map
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        instance = self.slug_map.get(data)
+        if instance is None:
+            self.fail(
+                'does_not_exist', slug_name=self.slug_field, value=data
+            )
+        return instance
+
+
 class TitleWriteSerializer(serializers.ModelSerializer):
-    category = serializers.SlugRelatedField(
+    category = CachedSlugRelatedField(
+        slug_map=category_slugs,
         queryset=Category.objects.all(),
         slug_field='slug',
     )
-    genre = serializers.SlugRelatedField(
+    genre = CachedSlugRelatedField(
+        slug_map=genre_slugs,
         queryset=Genre.objects.all(),
         slug_field='slug',
         many=True
@@ -149,7 +259,115 @@ class TitleWriteSerializer(serializers.ModelSerializer):
         return value
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class TitleBatchListSerializer(serializers.ListSerializer):
+    """Записывает пакет произведений фиксированным числом запросов."""
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+        errors, seen = [], set()
+        for item in validated_data:
+            title = item.get('id')
+            if title is not None and title.pk in seen:
+                errors.append({'id': [
+                    f'Произведение с id={title.pk} уже есть в пакете.'
+                ]})
+                continue
+            if title is not None:
+                seen.add(title.pk)
+            errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated_data
+
+    def create(self, validated_data):
+        created, updated, links = [], [], []
+        for data in validated_data:
+            genres = data.pop('genre')
+            title = data.pop('id', None)
+            if title is None:
+                title = Title(**data)
+                created.append(title)
+            else:
+                for attr, value in data.items():
+                    setattr(title, attr, value)
+                title.updated_at = timezone.now()
+                updated.append(title)
+            links.append((title, genres))
+
+        with transaction.atomic():
+            Title.objects.bulk_create(created)
+            features = connections[Title.objects.db].features
+            if created and not features.can_return_rows_from_bulk_insert:
+                # Запасной путь для баз данных, которые не возвращают id
+                # из bulk_create (SQLite в Django 3.2): строки вставлены
+                # в этой транзакции под блокировкой записи, поэтому это
+                # последние записи таблицы.
+                ids = list(Title.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                )[:len(created)])
+                for title, pk in zip(created, reversed(ids)):
+                    title.pk = pk
+            if updated:
+                Title.objects.bulk_update(updated, (
+                    'name', 'year', 'description', 'category', 'updated_at'
+                ))
+                Title.genre.through.objects.filter(
+                    title__in=updated
+                ).delete()
+                sync_ranking_categories([title.pk for title in updated])
+            Title.genre.through.objects.bulk_create(
+                Title.genre.through(title_id=title.pk, genre_id=genre.pk)
+                for title, genres in links
+                for genre in dict.fromkeys(genres)
+            )
+        # bulk_create и bulk_update не отправляют сигналы.
+        bump_on_commit(Title._meta.model_name, POSTINGS_VERSION)
+        return [title for title, _ in links]
+
+
+class TitleBatchSerializer(TitleWriteSerializer):
+    """Элемент пакетной записи произведений.
+
+    Проверки те же, что у TitleWriteSerializer; изменяемые произведения
+    ищутся в словаре ``titles`` из контекста, заполненном заранее для
+    всего пакета.
+    """
+    id = serializers.IntegerField(
+        required=False, min_value=1, max_value=MAX_TITLE_ID
+    )
+
+    class Meta(TitleWriteSerializer.Meta):
+        list_serializer_class = TitleBatchListSerializer
+
+    def validate_id(self, value):
+        if value not in self.context['titles']:
+            raise serializers.ValidationError(
+                f'Произведение с id={value} не найдено.'
+            )
+        return self.context['titles'][value]
+
+
+def violates_constraint(error, model, name):
+    """Вызвано ли IntegrityError нарушением ограничения ``name`` модели.
+
+    PostgreSQL и MySQL называют ограничение в тексте ошибки, SQLite —
+    только столбцы уникального ограничения.
+    """
+    message = str(error)
+    if name in message:
+        return True
+    constraint = next(
+        item for item in model._meta.constraints if item.name == name
+    )
+    table = model._meta.db_table
+    columns = ', '.join(
+        f'{table}.{model._meta.get_field(field).column}'
+        for field in constraint.fields
+    )
+    return message == f'UNIQUE constraint failed: {columns}'
+
+
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     title = serializers.SlugRelatedField(
         slug_field='name',
         read_only=True
@@ -164,22 +382,27 @@ class ReviewSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Оценка должна быть от 0 до 10')
         return value
 
-    def validate(self, data):
-        request = self.context['request']
-        if request.method == 'POST':
-            author = request.user
-            title_id = self.context.get('view').kwargs.get('title_id')
-            title = get_object_or_404(Title, pk=title_id)
-            if Review.objects.filter(title=title, author=author).exists():
-                raise ValidationError('Может существовать только один отзыв')
-        return data
+    def create(self, validated_data):
+        # Повторный отзыв отклоняется ограничением уникальности при
+        # вставке, без отдельного запроса на проверку.
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as error:
+            if not violates_constraint(error, Review, 'unique review'):
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Может существовать только один отзыв'
+                ]
+            })
 
     class Meta:
         fields = ('id', 'title', 'text', 'author', 'score', 'pub_date')
         model = Review
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     review = serializers.SlugRelatedField(
         slug_field='text',
         read_only=True
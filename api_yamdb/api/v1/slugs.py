@@ -0,0 +1,61 @@
+from reviews.models import Category, Genre
+
+from .cache import ProcessLocalData
+
+
+class SlugMap(ProcessLocalData):
+    """Словарь «слаг → запись» небольшого справочника в памяти процесса.
+
+    Перестраивается одним запросом, когда меняется версия модели
+    (её увеличивают сигналы после фиксации изменений), поэтому поиск по
+    слагу на запись и в фильтрах обходится без запросов. Слаг, которого
+    нет в словаре, ищется в базе: запись могла появиться в другом
+    процессе.
+    """
+    fields = ('id', 'name', 'slug')
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.version_name = model._meta.model_name
+
+    def __deepcopy__(self, memo):
+        # Поля DRF копируются вместе с аргументами; словарь общий.
+        return self
+
+    def get_rows(self):
+        return self.get_data()
+
+    def build(self):
+        return {
+            row['slug']: row
+            for row in self.model.objects.values(*self.fields)
+        }
+
+    def get_row(self, slug):
+        rows = self.get_rows()
+        row = rows.get(slug)
+        if row is None:
+            row = self.model.objects.filter(slug=slug).values(
+                *self.fields
+            ).first()
+            if row is not None:
+                rows[slug] = row
+        return row
+
+    def get_id(self, slug):
+        row = self.get_row(slug)
+        return None if row is None else row['id']
+
+    def get(self, slug):
+        """Запись со слагом ``slug`` (остальные поля отложены) или None."""
+        row = self.get_row(slug)
+        if row is None:
+            return None
+        return self.model.from_db(
+            self.model.objects.db, list(row), list(row.values())
+        )
+
+
+category_slugs = SlugMap(Category)
+genre_slugs = SlugMap(Genre)
@@ -8,7 +8,9 @@ from .views import (
     ReviewViewSet,
     UserViewSet,
     create_token,
-    create_user
+    create_user,
+    export_comments,
+    export_reviews,
 )
 
 v1_router = DefaultRouter()
@@ -33,6 +35,8 @@ auth_patterns = [
 ]
 
 urlpatterns = [
+    path('reviews/export/', export_reviews, name='export_reviews'),
+    path('comments/export/', export_comments, name='export_comments'),
     path('', include(v1_router.urls)),
     path('auth/', include(auth_patterns)),
 ]
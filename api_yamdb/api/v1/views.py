@@ -1,8 +1,13 @@
-from rest_framework import mixins, viewsets, filters, status
+from rest_framework import mixins, serializers, viewsets, filters, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import (
+    action, api_view, permission_classes, renderer_classes
+)
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Avg
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
@@ -10,17 +15,29 @@ from django.conf import settings
 from django_filters.rest_framework import DjangoFilterBackend
 from smtplib import SMTPResponseException
 from rest_framework_simplejwt.tokens import RefreshToken
-from reviews.models import Category, Genre, Title, Review
+from reviews.models import Category, Comment, Genre, Title, Review
 from users.models import User
-from .filters import TitleFilter
+from .cache import (CachedListMixin, CachedRetrieveMixin,
+                    get_or_set_versioned)
+from .export import NDJSONRenderer, ndjson_response
+from .fast_serializers import (FastCategorySerializer,
+                               FastCommentSerializer, FastGenreSerializer,
+                               FastReviewSerializer, FastTitleSerializer)
+from .filters import TitleFilter, TopTitleFilter
+from .pagination import CachedCountPagination, FeedPagination
 from .permissions import (
     IsAdminOrReadOnly, AdminOrModeratorIsAuthorPermission, IsAdmin
 )
 from .serializers import (
+    MAX_TITLE_ID,
+    CatalogStatsSerializer,
     CategorySerializer,
     GenreSerializer,
+    TitleBatchSerializer,
+    TitleDetailSerializer,
     TitleReadSerializer,
     TitleWriteSerializer,
+    TopTitleSerializer,
     ReviewSerializer,
     CommentSerializer,
     UserSerializer,
@@ -29,6 +46,117 @@ from .serializers import (
 )
 
 
+class SparseQuerysetMixin:
+    """Сужает выборку под поля, запрошенные через ?fields= и ?omit=.
+
+    Загружаются только колонки выводимых полей (и полей курсорной
+    сортировки), а select_related/prefetch_related остаются лишь для
+    связей, которые попадут в ответ.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'get_sparse_fields'):
+            return queryset
+        if serializer_class.get_sparse_fields(self.request, ()) is None:
+            return queryset
+        return self.narrow_queryset(
+            queryset, self.get_serializer().fields.values()
+        )
+
+    def narrow_queryset(self, queryset, fields):
+        names = {
+            field.source.split('.')[0] for field in fields
+            if field.source != '*'
+        }
+        names.update(
+            name.lstrip('-') for name in getattr(self, 'cursor_ordering', ())
+        )
+        columns, relations = [], set()
+        for name in names:
+            try:
+                model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if not model_field.concrete:
+                relations.add(name)
+                continue
+            columns.append(name)
+            if model_field.is_relation:
+                relations.add(name)
+
+        select_related = queryset.query.select_related
+        if isinstance(select_related, dict):
+            queryset = queryset.select_related(None).select_related(
+                *(name for name in select_related if name in relations)
+            )
+        prefetch = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_through', lookup).split('__')[0]
+            in relations
+        ]
+        queryset = queryset.prefetch_related(None).prefetch_related(*prefetch)
+        return queryset.only(*columns)
+
+
+class FastListMixin:
+    """GET-списки через быстрый сериализатор из ``fast_serializers``."""
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if (
+            self.fast_serializer_class is None
+            or not settings.API_FAST_SERIALIZERS
+        ):
+            return super().list(request, *args, **kwargs)
+        fast_serializer = self.fast_serializer_class(request, self)
+        queryset = fast_serializer.prepare(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(fast_serializer.represent(list(queryset)))
+        return self.get_paginated_response(fast_serializer.represent(page))
+
+
+class CatalogStatsMixin:
+    """Сводка по произведениям каждой записи справочника.
+
+    Считается одним сгруппированным запросом по счётчикам отзывов
+    произведений и хранится в кэше до изменения справочника,
+    произведений или отзывов.
+    """
+    stats_dependencies = ('title', 'review')
+    cached_actions = ('list', 'retrieve', 'stats')
+
+    def initial(self, request, *args, **kwargs):
+        if self.action == 'stats':
+            self.cache_dependencies = (
+                *self.cache_dependencies, *self.stats_dependencies
+            )
+        super().initial(request, *args, **kwargs)
+
+    @action(detail=False, url_path='stats', pagination_class=None)
+    def stats(self, request):
+        response = self.get_cached_response(request)
+        if response is not None:
+            return response
+        return Response(get_or_set_versioned(
+            f'{self.basename}:stats', self.versions, self.get_stats
+        ))
+
+    def get_stats(self):
+        rows = self.get_queryset().order_by('name', 'pk').values(
+            'name', 'slug'
+        ).annotate(
+            title_count=Count('titles'),
+            review_count=Coalesce(Sum('titles__review_count'), 0),
+            score_sum=Coalesce(Sum('titles__rating_sum'), 0),
+        )
+        return list(CatalogStatsSerializer(rows, many=True).data)
+
+
 class ListRetrieveCreateDestroyViewSet(
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -39,10 +167,33 @@ class ListRetrieveCreateDestroyViewSet(
     pass
 
 
-class UserViewSet(ListRetrieveCreateDestroyViewSet):
+# Параметры действий-лент UserViewSet: сериализаторы и курсорная
+# пагинация от новых записей к старым.
+FEED_OPTIONS = {
+    'pagination_class': FeedPagination,
+    'cursor_ordering': ('-pub_date', '-pk'),
+    'filter_backends': (),
+}
+REVIEW_FEED = dict(
+    FEED_OPTIONS,
+    serializer_class=ReviewSerializer,
+    fast_serializer_class=FastReviewSerializer,
+)
+COMMENT_FEED = dict(
+    FEED_OPTIONS,
+    serializer_class=CommentSerializer,
+    fast_serializer_class=FastCommentSerializer,
+)
+
+
+class UserViewSet(SparseQuerysetMixin, ListRetrieveCreateDestroyViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    # Задаётся действиями-лентами.
+    fast_serializer_class = None
     permission_classes = (IsAdmin,)
+    pagination_class = CachedCountPagination
+    cursor_ordering = ('id',)
     lookup_field = 'username'
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
@@ -83,6 +234,63 @@ class UserViewSet(ListRetrieveCreateDestroyViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def author_feed(self, author, related_name, parent):
+        """Отзывы или комментарии автора, новые первыми.
+
+        Страница выбирается по индексу (author, pub_date) без OFFSET и
+        COUNT(*): автор подставляется менеджером связи, родитель
+        (произведение или отзыв) — через JOIN по первичному ключу.
+        """
+        queryset = getattr(author, related_name).all()
+        if settings.API_FAST_SERIALIZERS:
+            fast_serializer = self.fast_serializer_class(self.request, self)
+            page = self.paginate_queryset(fast_serializer.prepare(queryset))
+            return self.get_paginated_response(
+                fast_serializer.represent(page)
+            )
+        page = self.paginate_queryset(queryset.select_related(parent))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_author(self):
+        return get_object_or_404(User, username=self.kwargs['username'])
+
+    @action(
+        detail=False,
+        url_path='me/reviews',
+        permission_classes=(IsAuthenticated,),
+        **REVIEW_FEED,
+    )
+    def my_reviews(self, request):
+        return self.author_feed(request.user, 'reviews', 'title')
+
+    @action(
+        detail=False,
+        url_path='me/comments',
+        permission_classes=(IsAuthenticated,),
+        **COMMENT_FEED,
+    )
+    def my_comments(self, request):
+        return self.author_feed(request.user, 'comments', 'review')
+
+    @action(
+        detail=True,
+        url_path='reviews',
+        permission_classes=(AllowAny,),
+        **REVIEW_FEED,
+    )
+    def reviews(self, request, username=None):
+        return self.author_feed(self.get_author(), 'reviews', 'title')
+
+    @action(
+        detail=True,
+        url_path='comments',
+        permission_classes=(AllowAny,),
+        **COMMENT_FEED,
+    )
+    def comments(self, request, username=None):
+        return self.author_feed(self.get_author(), 'comments', 'review')
+
 
 @api_view(['POST'])
 @permission_classes((AllowAny,))
@@ -143,72 +351,257 @@ class ListCreateDestroyViewSet(
     pass
 
 
-class CategoryViewSet(ListCreateDestroyViewSet):
+class CategoryViewSet(
+    CatalogStatsMixin,
+    CachedListMixin,
+    FastListMixin,
+    SparseQuerysetMixin,
+    ListCreateDestroyViewSet
+):
     queryset = Category.objects.all()
+    cache_dependencies = ('category',)
     serializer_class = CategorySerializer
+    fast_serializer_class = FastCategorySerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
 
 
-class GenreViewSet(ListCreateDestroyViewSet):
+class GenreViewSet(
+    CatalogStatsMixin,
+    CachedListMixin,
+    FastListMixin,
+    SparseQuerysetMixin,
+    ListCreateDestroyViewSet
+):
     queryset = Genre.objects.all()
+    cache_dependencies = ('genre',)
     serializer_class = GenreSerializer
+    fast_serializer_class = FastGenreSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')
-    )
+class TitleViewSet(
+    CachedListMixin,
+    CachedRetrieveMixin,
+    FastListMixin,
+    SparseQuerysetMixin,
+    viewsets.ModelViewSet
+):
+    queryset = Title.objects.select_related(
+        'category'
+    ).prefetch_related('genre')
+    cache_dependencies = ('title', 'genre', 'category', 'review')
+    fast_serializer_class = FastTitleSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = CachedCountPagination
+    cursor_ordering = ('-year', 'name')
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
     filterset_class = TitleFilter
     ordering_fields = ('name',)
+    cached_actions = ('list', 'retrieve', 'top')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.select_related('score_histogram')
+        return queryset
 
     def get_serializer_class(self):
+        if self.action == 'top':
+            return TopTitleSerializer
+        if self.action == 'batch':
+            return TitleBatchSerializer
+        if self.action == 'retrieve':
+            return TitleDetailSerializer
         if self.request.method == 'GET':
             return TitleReadSerializer
         return TitleWriteSerializer
 
+    @action(
+        detail=False,
+        url_path='top',
+        filter_backends=(DjangoFilterBackend,),
+        filterset_class=TopTitleFilter,
+        cursor_ordering=('-ranking__score', 'ranking__title_id'),
+    )
+    def top(self, request):
+        """Произведения по убыванию взвешенной оценки из TitleRanking."""
+        response = self.get_cached_response(request)
+        if response is not None:
+            return response
+        queryset = self.filter_queryset(
+            self.get_queryset().select_related('ranking')
+        ).filter(ranking__isnull=False).order_by(
+            '-ranking__score', 'ranking__title_id'
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        url_path='export',
+        renderer_classes=(NDJSONRenderer,),
+        pagination_class=None,
+    )
+    def export(self, request):
+        """Все произведения (с учётом фильтров) в формате NDJSON."""
+        return ndjson_response(
+            FastTitleSerializer(request, None),
+            self.filter_queryset(self.get_queryset()),
+            'titles',
+        )
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """Создание и изменение (элементы с ``id``) списка произведений.
 
-class CommentViewSet(viewsets.ModelViewSet):
+        Изменяемые произведения загружаются одним запросом, слаги ищутся
+        в SlugMap, произведения и их жанры записываются bulk-операциями
+        в одной транзакции. При ошибках ничего не записывается, а ответ
+        содержит ошибки каждого элемента по порядку.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'non_field_errors': ['Ожидается список произведений.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.TITLE_BATCH_MAX_SIZE:
+            return Response(
+                {'non_field_errors': [
+                    'Не больше {} произведений за запрос.'.format(
+                        settings.TITLE_BATCH_MAX_SIZE
+                    )
+                ]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = self.get_serializer(
+            data=items, many=True, context={
+                **self.get_serializer_context(),
+                **self.get_batch_lookups(items),
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        titles = serializer.save()
+        queryset = self.get_queryset().in_bulk(
+            [title.pk for title in titles]
+        )
+        return Response(
+            TitleReadSerializer(
+                [queryset[title.pk] for title in titles], many=True
+            ).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @staticmethod
+    def get_batch_lookups(items):
+        ids = set()
+        for item in items:
+            try:
+                pk = int(item['id'])
+            except (TypeError, KeyError, ValueError):
+                continue
+            # Id вне диапазона не найдётся, а in_bulk упадёт с
+            # OverflowError; ошибку вернёт проверка поля.
+            if 0 < pk <= MAX_TITLE_ID:
+                ids.add(pk)
+        return {'titles': Title.objects.in_bulk(ids) if ids else {}}
+
+
+class CommentViewSet(
+    FastListMixin, SparseQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = CommentSerializer
+    fast_serializer_class = FastCommentSerializer
     permission_classes = (AdminOrModeratorIsAuthorPermission,)
+    pagination_class = CachedCountPagination
+    cursor_ordering = ('pub_date', 'pk')
 
     def get_review(self):
-        review = get_object_or_404(
-            Review, id=self.kwargs.get('review_id')
-        )
-        return review
+        # Отзыв запрашивается один раз за запрос.
+        if getattr(self, 'review', None) is None:
+            self.review = get_object_or_404(
+                Review, id=self.kwargs.get('review_id')
+            )
+        return self.review
 
     def get_queryset(self):
         review = self.get_review()
-        return review.comments.all()
+        # Отзыв подставляется менеджером связи, автор — через JOIN.
+        return review.comments.select_related('author')
 
     def perform_create(self, serializer):
         review = self.get_review()
         serializer.save(author=self.request.user, review=review)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+    FastListMixin, SparseQuerysetMixin, viewsets.ModelViewSet
+):
     serializer_class = ReviewSerializer
+    fast_serializer_class = FastReviewSerializer
     permission_classes = (AdminOrModeratorIsAuthorPermission,)
+    pagination_class = CachedCountPagination
+    cursor_ordering = ('pub_date', 'pk')
 
     def get_title(self):
-        title = get_object_or_404(
-            Title, id=self.kwargs.get('title_id')
-        )
-        return title
+        # Произведение запрашивается один раз за запрос.
+        if getattr(self, 'title', None) is None:
+            self.title = get_object_or_404(
+                Title, id=self.kwargs.get('title_id')
+            )
+        return self.title
 
     def get_queryset(self):
         title = self.get_title()
-        return title.reviews.all()
+        # Произведение подставляется менеджером связи, автор — через JOIN.
+        return title.reviews.select_related('author')
 
     def perform_create(self, serializer):
         title = self.get_title()
         serializer.save(author=self.request.user, title=title)
+
+
+def get_title_filter(request):
+    title_id = request.query_params.get('title')
+    if title_id is None:
+        return None
+    # Проверка до начала потока: ошибка в запросе к базе данных оборвала
+    # бы уже начатый ответ со статусом 200.
+    field = serializers.IntegerField(min_value=1, max_value=MAX_TITLE_ID)
+    try:
+        return field.run_validation(title_id)
+    except ValidationError as error:
+        raise ValidationError({'title': error.detail})
+
+
+@api_view(['GET'])
+@permission_classes((AllowAny,))
+@renderer_classes((NDJSONRenderer,))
+def export_reviews(request):
+    queryset = Review.objects.all()
+    title_id = get_title_filter(request)
+    if title_id is not None:
+        queryset = queryset.filter(title_id=title_id)
+    return ndjson_response(
+        FastReviewSerializer(request, None), queryset, 'reviews'
+    )
+
+
+@api_view(['GET'])
+@permission_classes((AllowAny,))
+@renderer_classes((NDJSONRenderer,))
+def export_comments(request):
+    queryset = Comment.objects.all()
+    title_id = get_title_filter(request)
+    if title_id is not None:
+        queryset = queryset.filter(review__title_id=title_id)
+    return ndjson_response(
+        FastCommentSerializer(request, None), queryset, 'comments'
+    )
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,6 +73,63 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+API_CACHE_TIMEOUT = 60 * 5
+# Срок в секундах, на который процесс кэширует версии моделей из
+# базы данных. Версии определяют ETag, Last-Modified и ключи кэша,
+# поэтому изменения из других процессов видны не позже этого срока.
+API_VERSIONS_MAX_AGE = 1
+
+# Списки сериализуются из values() в обход ModelSerializer.
+API_FAST_SERIALIZERS = True
+
+# Число «средних» голосов, добавляемых к оценкам произведения
+# в рейтинге /titles/top/.
+RATING_MIN_VOTES = 5
+# Допустимое отклонение средней оценки от той, с которой построен
+# рейтинг; при большем отклонении рейтинг помечается для перестройки
+# командой `python manage.py rebuild_rankings --if-needed` (её же
+# выполняет `aggregates_worker`, когда очередь пуста). Один из них
+# должен работать и при REVIEW_AGGREGATES_DEFERRED = False.
+RATING_PRIOR_TOLERANCE = 0.1
+# Число строк счётчика изменений итогов рейтинга.
+RATING_COUNTER_SHARDS = 16
+
+# Агрегаты отзывов (рейтинг, место в рейтинге, распределение оценок)
+# пересчитываются не при записи отзыва, а фоновой командой
+# `python manage.py aggregates_worker`; до её прохода они устаревают.
+REVIEW_AGGREGATES_DEFERRED = False
+# Наибольшее число заданий пересчёта, выполняемых одной транзакцией.
+AGGREGATE_JOBS_BATCH_SIZE = 100
+
+# Если фильтр по жанрам может вернуть больше этого числа произведений,
+# он выполняется подзапросом к таблице жанров произведений, а не
+# передачей списка id из индекса в памяти.
+API_GENRE_FILTER_MAX_IDS = 10000
+
+# Для таблиц больше этого числа строк списки без фильтров отдают
+# оценку числа записей по статистике базы данных вместо COUNT(*).
+API_COUNT_ESTIMATE_THRESHOLD = 100000
+
+# Размер порции строк при выгрузке в NDJSON.
+API_EXPORT_CHUNK_SIZE = 2000
+
+# Ответы меньше этого размера в байтах не сжимаются.
+API_COMPRESSION_MIN_SIZE = 1024
+# Уровни сжатия: gzip — от 1 до 9, brotli (если установлен) — от 0 до 11.
+API_COMPRESSION_LEVELS = {'gzip': 6, 'br': 5}
+
+# Наибольший размер пакета в POST /api/v1/titles/batch/.
+TITLE_BATCH_MAX_SIZE = 500
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -123,6 +181,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10,
+    # JSON кодируется через orjson; вывод совпадает с JSONRenderer.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.v1.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.v1.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'api.v1.parsers.MessagePackParser',
+    ],
 }
 
 SIMPLE_JWT = {
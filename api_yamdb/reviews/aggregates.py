@@ -0,0 +1,101 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now, NullIf
+from django.utils import timezone
+
+from reviews.models import Review, ScoreHistogram, Title
+
+
+def update_title_rating(title_id, score_delta, count_delta):
+    """Применяет изменение суммы и количества оценок к произведению.
+
+    В UPDATE правые части вычисляются по старым значениям строки,
+    поэтому дельты добавляются и в выражение рейтинга.
+    """
+    rating_sum = F('rating_sum') + score_delta
+    review_count = F('review_count') + count_delta
+    Title.objects.filter(pk=title_id).update(
+        rating_sum=rating_sum,
+        review_count=review_count,
+        rating=rating_sum / NullIf(review_count, 0),
+        updated_at=Now(),
+    )
+
+
+def recalculate_ratings(titles=None):
+    """Пересчитывает рейтинг заданных (или всех) произведений одним UPDATE."""
+    if titles is None:
+        titles = Title.objects.all()
+    reviews = Review.objects.filter(
+        title=OuterRef('pk')
+    ).order_by().values('title')
+    rating_sum = Coalesce(
+        Subquery(reviews.annotate(total=Sum('score')).values('total')), 0
+    )
+    review_count = Coalesce(
+        Subquery(reviews.annotate(total=Count('pk')).values('total')), 0
+    )
+    titles.update(
+        rating_sum=rating_sum,
+        review_count=review_count,
+        rating=rating_sum / NullIf(review_count, 0),
+        updated_at=Now(),
+    )
+
+
+def update_score_histogram(title_id, changes):
+    """Применяет изменения ``{оценка: дельта}`` к гистограмме произведения.
+
+    Строка гистограммы создаётся при первом отзыве; если её одновременно
+    создал другой запрос, изменения применяются повторным UPDATE.
+    """
+    updates = {
+        f'score_{score}': F(f'score_{score}') + delta
+        for score, delta in changes.items() if delta
+    }
+    if not updates or ScoreHistogram.objects.filter(
+        title_id=title_id
+    ).update(**updates):
+        return
+    if any(delta < 0 for delta in changes.values()):
+        return
+    try:
+        with transaction.atomic():
+            ScoreHistogram.objects.create(title_id=title_id, **{
+                f'score_{score}': delta for score, delta in changes.items()
+            })
+    except IntegrityError:
+        ScoreHistogram.objects.filter(title_id=title_id).update(**updates)
+
+
+def rebuild_score_histograms(batch_size=1000, title_ids=None):
+    """Строит гистограммы заданных (или всех) произведений одним GROUP BY.
+
+    У перестроенных произведений обновляется ``updated_at``, чтобы
+    сменились ETag их страниц. Возвращает число произведений с отзывами.
+    """
+    reviews = Review.objects.order_by()
+    histograms_to_delete = ScoreHistogram.objects.all()
+    titles = Title.objects.all()
+    if title_ids is not None:
+        reviews = reviews.filter(title_id__in=title_ids)
+        histograms_to_delete = histograms_to_delete.filter(
+            title_id__in=title_ids
+        )
+        titles = titles.filter(pk__in=title_ids)
+    histograms = {}
+    rows = reviews.values('title_id', 'score').annotate(total=Count('pk'))
+    for row in rows.iterator():
+        histogram = histograms.setdefault(
+            row['title_id'], ScoreHistogram(title_id=row['title_id'])
+        )
+        setattr(histogram, f'score_{row["score"]}', row['total'])
+    with transaction.atomic():
+        histograms_to_delete.delete()
+        ScoreHistogram.objects.bulk_create(
+            histograms.values(), batch_size=batch_size
+        )
+        # timezone.now(), а не Now(): CURRENT_TIMESTAMP в SQLite с
+        # точностью до секунды, и ETag мог бы не смениться.
+        titles.update(updated_at=timezone.now())
+    return len(histograms)
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reviews.models import Title
+from reviews.queue import aggregates_updated, process_jobs
+from reviews.ranking import rebuild_rankings_if_needed
+
+
+class Command(BaseCommand):
+    help = 'Process deferred title aggregate recomputation jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.AGGREGATE_JOBS_BATCH_SIZE,
+            help='Наибольшее число заданий в одной транзакции',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задания, которые есть в очереди, и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        try:
+            while True:
+                count = process_jobs(batch_size=options['batch_size'])
+                processed += count
+                if count:
+                    continue
+                # Рейтинг, помеченный записями отзывов, перестраивается,
+                # когда очередь пуста.
+                if rebuild_rankings_if_needed() is not None:
+                    aggregates_updated.send(sender=Title, title_ids=None)
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Агрегаты пересчитаны: {processed} произведений'
+        ))
@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from reviews.aggregates import (recalculate_ratings,
+                                rebuild_score_histograms)
+from reviews.ranking import rebuild_rankings
 from reviews.models import Category, Comment, Genre, Review, Title, User
 import csv
 
@@ -34,3 +37,9 @@ class Command(BaseCommand):
                 )
             except ValueError as error:
                 print(f'Ошибка при загрузке файла "{csv_load_file}": {error}')
+        # bulk_create не отправляет сигналы, поэтому рейтинги
+        # загруженных произведений пересчитываются отдельно.
+        recalculate_ratings()
+        rebuild_rankings()
+        rebuild_score_histograms()
+        self.stdout.write(self.style.SUCCESS('Рейтинги пересчитаны!'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from reviews.models import Title
+from reviews.queue import aggregates_updated
+from reviews.ranking import rebuild_rankings, rebuild_rankings_if_needed
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Bayesian title ranking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одном INSERT',
+        )
+        parser.add_argument(
+            '--if-needed', action='store_true',
+            help='Перестроить, только если средняя оценка ушла от той, '
+                 'с которой построен рейтинг',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_needed']:
+            count = rebuild_rankings_if_needed(
+                batch_size=options['batch_size']
+            )
+        else:
+            count = rebuild_rankings(batch_size=options['batch_size'])
+        if count is None:
+            self.stdout.write('Рейтинг не требует перестройки')
+            return
+        aggregates_updated.send(sender=Title, title_ids=None)
+        self.stdout.write(
+            self.style.SUCCESS(f'Рейтинг перестроен: {count} произведений')
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from reviews.aggregates import rebuild_score_histograms
+from reviews.models import Title
+from reviews.queue import aggregates_updated
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-title score histograms'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одном INSERT',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_score_histograms(batch_size=options['batch_size'])
+        aggregates_updated.send(sender=Title, title_ids=None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Распределения оценок перестроены: {count} произведений'
+        ))
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Индекс создаётся без пересоздания таблицы reviews_title в SQLite."""
+
+    dependencies = [
+        ('reviews', '0005_title_search_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE INDEX "reviews_title_year_25306d5f" '
+                    'ON "reviews_title" ("year");',
+                    'DROP INDEX "reviews_title_year_25306d5f";',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='title',
+                    name='year',
+                    field=models.PositiveIntegerField(db_index=True, help_text='Год выпуска', verbose_name='Год выпуска'),
+                ),
+            ],
+        ),
+    ]
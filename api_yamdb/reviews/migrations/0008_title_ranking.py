@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 20:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_sum', models.PositiveBigIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='Количество отзывов')),
+                ('prior_mean', models.FloatField(default=0, help_text='Средняя оценка, с которой построен рейтинг', verbose_name='Средняя оценка рейтинга')),
+            ],
+            options={
+                'verbose_name': 'Итоги рейтинга',
+                'verbose_name_plural': 'Итоги рейтинга',
+            },
+        ),
+        migrations.CreateModel(
+            name='TitleRanking',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='reviews.title', verbose_name='Произведение')),
+                ('score', models.FloatField(help_text='Байесовская средняя оценка произведения', verbose_name='Взвешенная оценка')),
+                ('category', models.ForeignKey(db_index=False, help_text='Копия категории произведения для выборок по категории', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reviews.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге',
+                'verbose_name_plural': 'Рейтинг произведений',
+                'ordering': ('-score', 'title'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='titleranking',
+            index=models.Index(fields=['-score', 'title'], name='ranking_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='titleranking',
+            index=models.Index(fields=['category', '-score', 'title'], name='ranking_category_score_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Sum
+
+
+def backfill_ranking(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    TitleRanking = apps.get_model('reviews', 'TitleRanking')
+    RankingTotals = apps.get_model('reviews', 'RankingTotals')
+    totals = Title.objects.aggregate(
+        score_sum=Sum('rating_sum'), review_count=Sum('review_count')
+    )
+    score_sum = totals['score_sum'] or 0
+    review_count = totals['review_count'] or 0
+    mean = score_sum / review_count if review_count else 0.0
+    RankingTotals.objects.create(
+        pk=1,
+        score_sum=score_sum,
+        review_count=review_count,
+        prior_mean=mean,
+    )
+    min_votes = settings.RATING_MIN_VOTES
+    TitleRanking.objects.bulk_create(
+        (
+            TitleRanking(
+                title_id=pk,
+                category_id=category_id,
+                score=(rating_sum + min_votes * mean) / (count + min_votes),
+            )
+            for pk, rating_sum, count, category_id
+            in Title.objects.filter(review_count__gt=0).values_list(
+                'pk', 'rating_sum', 'review_count', 'category_id'
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_title_ranking'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ranking, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2 on 2026-10-18 21:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_backfill_title_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreHistogram',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_histogram', serialize=False, to='reviews.title', verbose_name='Произведение')),
+                ('score_1', models.PositiveIntegerField(default=0, verbose_name='Оценок «1»')),
+                ('score_2', models.PositiveIntegerField(default=0, verbose_name='Оценок «2»')),
+                ('score_3', models.PositiveIntegerField(default=0, verbose_name='Оценок «3»')),
+                ('score_4', models.PositiveIntegerField(default=0, verbose_name='Оценок «4»')),
+                ('score_5', models.PositiveIntegerField(default=0, verbose_name='Оценок «5»')),
+                ('score_6', models.PositiveIntegerField(default=0, verbose_name='Оценок «6»')),
+                ('score_7', models.PositiveIntegerField(default=0, verbose_name='Оценок «7»')),
+                ('score_8', models.PositiveIntegerField(default=0, verbose_name='Оценок «8»')),
+                ('score_9', models.PositiveIntegerField(default=0, verbose_name='Оценок «9»')),
+                ('score_10', models.PositiveIntegerField(default=0, verbose_name='Оценок «10»')),
+            ],
+            options={
+                'verbose_name': 'Распределение оценок',
+                'verbose_name_plural': 'Распределения оценок',
+            },
+        ),
+    ]
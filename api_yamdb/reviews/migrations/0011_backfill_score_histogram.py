@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_histograms(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    ScoreHistogram = apps.get_model('reviews', 'ScoreHistogram')
+    histograms = {}
+    rows = Review.objects.order_by().values('title_id', 'score').annotate(
+        total=Count('pk')
+    )
+    for row in rows.iterator():
+        histogram = histograms.setdefault(
+            row['title_id'], ScoreHistogram(title_id=row['title_id'])
+        )
+        setattr(histogram, f'score_{row["score"]}', row['total'])
+    ScoreHistogram.objects.bulk_create(histograms.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_score_histogram'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_backfill_score_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title_id', models.PositiveBigIntegerField(db_index=True, verbose_name='id произведения')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Задание на пересчёт',
+                'verbose_name_plural': 'Задания на пересчёт',
+                'ordering': ('pk',),
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 21:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_title_review_pub_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingCounter',
+            fields=[
+                ('shard', models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name='Номер строки')),
+                ('score_delta', models.BigIntegerField(default=0, verbose_name='Изменение суммы оценок')),
+                ('count_delta', models.IntegerField(default=0, verbose_name='Изменение количества отзывов')),
+            ],
+            options={
+                'verbose_name': 'Счётчик итогов рейтинга',
+                'verbose_name_plural': 'Счётчики итогов рейтинга',
+            },
+        ),
+        migrations.AddField(
+            model_name='rankingtotals',
+            name='needs_rebuild',
+            field=models.BooleanField(default=False, help_text='Средняя оценка ушла от prior_mean дальше RATING_PRIOR_TOLERANCE', verbose_name='Нужно перестроить'),
+        ),
+    ]
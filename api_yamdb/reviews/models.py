@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MaxValueValidator, MinValueValidator
 from users.models import User
 
+# Допустимые оценки отзыва.
+SCORES = range(1, 11)
+
 
 class Category(models.Model):
     name = models.CharField(
@@ -15,6 +18,10 @@ class Category(models.Model):
         verbose_name='Слаг',
         help_text='Слаг категории'
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = 'Категория'
@@ -37,6 +44,10 @@ class Genre(models.Model):
         verbose_name='Слаг',
         help_text='Слаг жанра'
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = 'Жанр'
@@ -57,6 +68,7 @@ class Title(models.Model):
     year = models.PositiveIntegerField(
         verbose_name='Год выпуска',
         help_text='Год выпуска',
+        db_index=True,
     )
     description = models.TextField(
         verbose_name='Описание',
@@ -81,6 +93,29 @@ class Title(models.Model):
         null=True,
         on_delete=models.SET_NULL,
     )
+    rating = models.PositiveSmallIntegerField(
+        verbose_name='Рейтинг',
+        help_text='Средняя оценка произведения',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    rating_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        help_text='Сумма оценок всех отзывов',
+        default=0,
+        editable=False,
+    )
+    review_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        help_text='Количество отзывов на произведение',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         verbose_name = 'Произведение'
@@ -91,12 +126,227 @@ class Title(models.Model):
         return self.name
 
 
+class TitleRanking(models.Model):
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name='Произведение',
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Категория',
+        help_text='Копия категории произведения для выборок по категории',
+        null=True,
+        db_index=False,
+    )
+    score = models.FloatField(
+        verbose_name='Взвешенная оценка',
+        help_text='Байесовская средняя оценка произведения',
+    )
+
+    class Meta:
+        verbose_name = 'Место в рейтинге'
+        verbose_name_plural = 'Рейтинг произведений'
+        ordering = ('-score', 'title')
+        indexes = [
+            models.Index(
+                fields=('-score', 'title'),
+                name='ranking_score_idx',
+            ),
+            models.Index(
+                fields=('category', '-score', 'title'),
+                name='ranking_category_score_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.title_id}: {self.score:.2f}'
+
+
+class RankingTotals(models.Model):
+    """Суммы оценок по всем произведениям — единственная строка."""
+    score_sum = models.PositiveBigIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+    )
+    review_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+    )
+    prior_mean = models.FloatField(
+        verbose_name='Средняя оценка рейтинга',
+        help_text='Средняя оценка, с которой построен рейтинг',
+        default=0,
+    )
+    needs_rebuild = models.BooleanField(
+        verbose_name='Нужно перестроить',
+        help_text='Средняя оценка ушла от prior_mean дальше '
+                  'RATING_PRIOR_TOLERANCE',
+        default=False,
+    )
+
+    class Meta:
+        verbose_name = 'Итоги рейтинга'
+        verbose_name_plural = 'Итоги рейтинга'
+
+    def __str__(self):
+        return f'{self.prior_mean:.2f}'
+
+
+class RankingCounter(models.Model):
+    """Изменения сумм оценок после построения рейтинга.
+
+    Разнесены по RATING_COUNTER_SHARDS строкам, чтобы записи отзывов к
+    разным произведениям не ждали друг друга на одной строке итогов.
+    """
+    shard = models.PositiveSmallIntegerField(
+        verbose_name='Номер строки',
+        primary_key=True,
+    )
+    score_delta = models.BigIntegerField(
+        verbose_name='Изменение суммы оценок',
+        default=0,
+    )
+    count_delta = models.IntegerField(
+        verbose_name='Изменение количества отзывов',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчик итогов рейтинга'
+        verbose_name_plural = 'Счётчики итогов рейтинга'
+
+    def __str__(self):
+        return f'{self.shard}: {self.score_delta}/{self.count_delta}'
+
+
+class ScoreHistogram(models.Model):
+    """Число отзывов с каждой оценкой от 1 до 10 по произведению."""
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score_histogram',
+        verbose_name='Произведение',
+    )
+    score_1 = models.PositiveIntegerField(
+        verbose_name='Оценок «1»',
+        default=0,
+    )
+    score_2 = models.PositiveIntegerField(
+        verbose_name='Оценок «2»',
+        default=0,
+    )
+    score_3 = models.PositiveIntegerField(
+        verbose_name='Оценок «3»',
+        default=0,
+    )
+    score_4 = models.PositiveIntegerField(
+        verbose_name='Оценок «4»',
+        default=0,
+    )
+    score_5 = models.PositiveIntegerField(
+        verbose_name='Оценок «5»',
+        default=0,
+    )
+    score_6 = models.PositiveIntegerField(
+        verbose_name='Оценок «6»',
+        default=0,
+    )
+    score_7 = models.PositiveIntegerField(
+        verbose_name='Оценок «7»',
+        default=0,
+    )
+    score_8 = models.PositiveIntegerField(
+        verbose_name='Оценок «8»',
+        default=0,
+    )
+    score_9 = models.PositiveIntegerField(
+        verbose_name='Оценок «9»',
+        default=0,
+    )
+    score_10 = models.PositiveIntegerField(
+        verbose_name='Оценок «10»',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Распределение оценок'
+        verbose_name_plural = 'Распределения оценок'
+
+    def __str__(self):
+        return str(self.title_id)
+
+    def distribution(self):
+        return {
+            str(score): getattr(self, f'score_{score}') for score in SCORES
+        }
+
+
+class AggregateJob(models.Model):
+    """Задание на пересчёт агрегатов произведения.
+
+    Создаётся при записи отзыва, если агрегаты пересчитываются
+    отложенно (REVIEW_AGGREGATES_DEFERRED), и выполняется командой
+    aggregates_worker. Ссылка на произведение — не внешний ключ: задания
+    создаются и при каскадном удалении отзывов вместе с произведением.
+    """
+    title_id = models.PositiveBigIntegerField(
+        verbose_name='id произведения',
+        db_index=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Задание на пересчёт'
+        verbose_name_plural = 'Задания на пересчёт'
+        ordering = ('pk',)
+
+    def __str__(self):
+        return str(self.title_id)
+
+
+class DataVersion(models.Model):
+    """Версия данных модели для ключей кэша и валидаторов ответов.
+
+    Хранится в базе данных, чтобы изменение, сделанное одним процессом
+    (веб-сервером или командой), меняло ETag и ключи кэша во всех
+    процессах.
+    """
+    name = models.CharField(
+        verbose_name='Имя',
+        max_length=50,
+        primary_key=True,
+    )
+    version = models.PositiveBigIntegerField(
+        verbose_name='Версия',
+        help_text='Время последнего изменения в миллисекундах',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
 class Review(models.Model):
     title = models.ForeignKey(
         Title,
         on_delete=models.CASCADE,
         related_name='reviews',
-        verbose_name='произведение'
+        verbose_name='произведение',
+        # Выборки по произведению покрывает индекс (title, pub_date).
+        db_index=False
     )
     text = models.CharField(
         max_length=200
@@ -105,13 +355,15 @@ class Review(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='reviews',
-        verbose_name='автор'
+        verbose_name='автор',
+        # Выборки по автору покрывает индекс (author, pub_date).
+        db_index=False
     )
     score = models.PositiveIntegerField(
         'оценка',
         validators=(
-            MinValueValidator(1),
-            MaxValueValidator(10)
+            MinValueValidator(SCORES[0]),
+            MaxValueValidator(SCORES[-1])
         ),
         error_messages={'validators': 'Оценка должна быть от 1 до 10'}
     )
@@ -120,6 +372,10 @@ class Review(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        'дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Отзыв'
@@ -129,7 +385,39 @@ class Review(models.Model):
                 fields=('title', 'author', ),
                 name='unique review'
             )]
-        ordering = ('pub_date',)
+        indexes = [
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='review_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('title', 'pub_date'),
+                name='review_title_pub_date_idx',
+            ),
+        ]
+        ordering = ('pub_date', 'pk')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Оценка на момент загрузки нужна, чтобы при редактировании
+        # отзыва пересчитать рейтинг по разнице, а не заново.
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Рейтинг произведения обновляется в post_save той же транзакцией.
+        with transaction.atomic():
+            if not self._state.adding and self.pk is not None:
+                # Оценку, загруженную до транзакции, мог изменить
+                # параллельный запрос: разница считается от оценки,
+                # перечитанной под блокировкой строки.
+                score = Review.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('score', flat=True).first()
+                if score is not None:
+                    self._loaded_score = score
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.text
@@ -140,7 +428,9 @@ class Comment(models.Model):
         Review,
         on_delete=models.CASCADE,
         related_name='comments',
-        verbose_name='отзыв'
+        verbose_name='отзыв',
+        # Выборки по отзыву покрывает индекс (review, pub_date).
+        db_index=False
     )
     text = models.CharField(
         'текст комментария',
@@ -150,17 +440,34 @@ class Comment(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='comments',
-        verbose_name='автор'
+        verbose_name='автор',
+        # Выборки по автору покрывает индекс (author, pub_date).
+        db_index=False
     )
     pub_date = models.DateTimeField(
         'дата публикации',
         auto_now_add=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        'дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='comment_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('review', 'pub_date'),
+                name='comment_review_pub_date_idx',
+            ),
+        ]
+        ordering = ('pub_date', 'pk')
 
     def __str__(self):
         return self.text
@@ -0,0 +1,44 @@
+"""Очередь заданий на пересчёт агрегатов произведений в базе данных.
+
+Запись отзыва добавляет задание в той же транзакции; команда
+aggregates_worker забирает задания пачками, объединяет повторы по
+произведению и пересчитывает агрегаты заново по отзывам, поэтому
+порядок и число заданий на одно произведение неважны.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+
+from reviews.aggregates import recalculate_ratings, rebuild_score_histograms
+from reviews.models import AggregateJob, Title
+from reviews.ranking import refresh_rankings
+
+# Отправляется после пересчёта с аргументом title_ids (None — после
+# перестройки рейтинга всех произведений).
+aggregates_updated = Signal()
+
+
+def enqueue_title(title_id):
+    AggregateJob.objects.create(title_id=title_id)
+
+
+def process_jobs(batch_size=100):
+    """Выполняет одну пачку заданий, возвращает число произведений.
+
+    Задания удаляются до пересчёта в той же транзакции: задание,
+    добавленное после удаления, останется в очереди и будет выполнено
+    следующей пачкой, так что изменения не теряются.
+    """
+    with transaction.atomic():
+        title_ids = sorted(set(
+            AggregateJob.objects.order_by('pk').values_list(
+                'title_id', flat=True
+            )[:batch_size]
+        ))
+        if not title_ids:
+            return 0
+        AggregateJob.objects.filter(title_id__in=title_ids).delete()
+        recalculate_ratings(Title.objects.filter(pk__in=title_ids))
+        rebuild_score_histograms(title_ids=title_ids)
+        refresh_rankings(title_ids)
+    aggregates_updated.send(sender=Title, title_ids=title_ids)
+    return len(title_ids)
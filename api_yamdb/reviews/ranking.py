@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+
+from reviews.models import (RankingCounter, RankingTotals, Title,
+                            TitleRanking)
+
+TOTALS_PK = 1
+
+
+def weighted_score(rating_sum, review_count, mean):
+    """Байесовская оценка: к отзывам добавляются RATING_MIN_VOTES
+    голосов со средней по всем произведениям оценкой."""
+    min_votes = settings.RATING_MIN_VOTES
+    return (rating_sum + min_votes * mean) / (review_count + min_votes)
+
+
+def get_prior(totals):
+    """Средняя оценка рейтинга и признак ухода текущей средней от неё.
+
+    Текущая средняя считается по итогам последней перестройки и
+    изменениям в строках RankingCounter.
+    """
+    if totals is None:
+        return 0.0, True
+    deltas = RankingCounter.objects.aggregate(
+        score_delta=Sum('score_delta'), count_delta=Sum('count_delta')
+    )
+    score_sum = totals.score_sum + (deltas['score_delta'] or 0)
+    review_count = totals.review_count + (deltas['count_delta'] or 0)
+    mean = score_sum / review_count if review_count else 0.0
+    return totals.prior_mean, abs(
+        mean - totals.prior_mean
+    ) > settings.RATING_PRIOR_TOLERANCE
+
+
+def add_to_counter(shard, score_delta, count_delta):
+    counter = RankingCounter.objects.filter(shard=shard)
+    changes = {
+        'score_delta': F('score_delta') + score_delta,
+        'count_delta': F('count_delta') + count_delta,
+    }
+    if counter.update(**changes):
+        return
+    _, created = RankingCounter.objects.get_or_create(shard=shard, defaults={
+        'score_delta': score_delta, 'count_delta': count_delta,
+    })
+    if not created:
+        counter.update(**changes)
+
+
+def update_title_ranking(title_id, score_delta, count_delta):
+    """Обновляет строку рейтинга произведения.
+
+    Изменение итогов записывается в одну из RATING_COUNTER_SHARDS строк
+    счётчика. Строки рейтинга посчитаны с одной средней оценкой
+    ``prior_mean``; если текущая средняя ушла от неё дальше
+    RATING_PRIOR_TOLERANCE, рейтинг только помечается для перестройки —
+    её выполняет rebuild_rankings вне запроса.
+
+    Рейтинг, построенный без отзывов, средней не имеет и сразу
+    перестраивается: в нём есть только произведения, оценённые после
+    построения, поэтому перестройка дешёвая и выполняется один раз.
+    """
+    add_to_counter(
+        title_id % settings.RATING_COUNTER_SHARDS, score_delta, count_delta
+    )
+    totals = RankingTotals.objects.filter(pk=TOTALS_PK).first()
+    if totals is None or not totals.review_count:
+        rebuild_rankings()
+        return
+    prior_mean, drifted = get_prior(totals)
+    if drifted and not totals.needs_rebuild:
+        RankingTotals.objects.update_or_create(
+            pk=TOTALS_PK, defaults={'needs_rebuild': True}
+        )
+    row = Title.objects.filter(pk=title_id).values_list(
+        'rating_sum', 'review_count', 'category_id'
+    ).first()
+    if row is None or not row[1]:
+        TitleRanking.objects.filter(title_id=title_id).delete()
+        return
+    rating_sum, review_count, category_id = row
+    values = {
+        'category_id': category_id,
+        'score': weighted_score(rating_sum, review_count, prior_mean),
+    }
+    if not TitleRanking.objects.filter(title_id=title_id).update(**values):
+        TitleRanking.objects.create(title_id=title_id, **values)
+
+
+def get_totals():
+    totals = Title.objects.aggregate(
+        score_sum=Sum('rating_sum'), review_count=Sum('review_count')
+    )
+    return totals['score_sum'] or 0, totals['review_count'] or 0
+
+
+def rebuild_rankings(batch_size=1000):
+    """Полностью перестраивает рейтинг, возвращает число строк."""
+    with transaction.atomic():
+        # Записи отзывов ждут перестройки на строках счётчика, поэтому
+        # их изменения не теряются при обнулении.
+        list(RankingCounter.objects.select_for_update())
+        score_sum, review_count = get_totals()
+        mean = score_sum / review_count if review_count else 0.0
+        RankingTotals.objects.update_or_create(pk=TOTALS_PK, defaults={
+            'score_sum': score_sum,
+            'review_count': review_count,
+            'prior_mean': mean,
+            'needs_rebuild': False,
+        })
+        RankingCounter.objects.update(score_delta=0, count_delta=0)
+        rows = Title.objects.filter(review_count__gt=0).values_list(
+            'pk', 'rating_sum', 'review_count', 'category_id'
+        )
+        TitleRanking.objects.all().delete()
+        rankings = TitleRanking.objects.bulk_create(
+            (
+                TitleRanking(
+                    title_id=pk,
+                    category_id=category_id,
+                    score=weighted_score(rating_sum, count, mean),
+                )
+                for pk, rating_sum, count, category_id in rows
+            ),
+            batch_size=batch_size,
+        )
+    return len(rankings)
+
+
+def rebuild_rankings_if_needed(batch_size=1000):
+    """Перестраивает помеченный рейтинг; возвращает число строк или None."""
+    if not RankingTotals.objects.filter(
+        pk=TOTALS_PK, needs_rebuild=True
+    ).exists():
+        return None
+    return rebuild_rankings(batch_size=batch_size)
+
+
+def refresh_rankings(title_ids):
+    """Пересчитывает итоги и строки рейтинга заданных произведений.
+
+    Выполняется процессом aggregates_worker, а не в запросе, поэтому
+    итоги берутся точно по уже пересчитанным суммам оценок произведений,
+    и при уходе средней оценки дальше RATING_PRIOR_TOLERANCE рейтинг
+    сразу перестраивается целиком.
+    """
+    with transaction.atomic():
+        score_sum, review_count = get_totals()
+        totals = RankingTotals.objects.filter(pk=TOTALS_PK).first()
+        if totals is None or totals.needs_rebuild or abs(
+            score_sum / max(review_count, 1) - totals.prior_mean
+        ) > settings.RATING_PRIOR_TOLERANCE:
+            rebuild_rankings()
+            return
+        RankingTotals.objects.filter(pk=TOTALS_PK).update(
+            score_sum=score_sum, review_count=review_count
+        )
+        RankingCounter.objects.update(score_delta=0, count_delta=0)
+        rows = Title.objects.filter(
+            pk__in=title_ids, review_count__gt=0
+        ).values_list('pk', 'rating_sum', 'review_count', 'category_id')
+        TitleRanking.objects.filter(title_id__in=title_ids).delete()
+        TitleRanking.objects.bulk_create(
+            TitleRanking(
+                title_id=pk,
+                category_id=category_id,
+                score=weighted_score(rating_sum, count, totals.prior_mean),
+            )
+            for pk, rating_sum, count, category_id in rows
+        )
+
+
+def sync_ranking_categories(title_ids):
+    """Копирует категории произведений в их строки рейтинга."""
+    TitleRanking.objects.filter(title_id__in=title_ids).update(
+        category_id=Subquery(
+            Title.objects.filter(pk=OuterRef('title_id')).values(
+                'category_id'
+            )
+        )
+    )
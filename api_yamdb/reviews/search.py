@@ -0,0 +1,58 @@
+from django.db import connections
+
+TITLE_SEARCH_TABLE = 'reviews_title_fts'
+
+TITLE_SEARCH_TRIGGERS = {
+    f'{TITLE_SEARCH_TABLE}_ai': (
+        f'CREATE TRIGGER IF NOT EXISTS {TITLE_SEARCH_TABLE}_ai '
+        'AFTER INSERT ON reviews_title BEGIN '
+        f'INSERT INTO {TITLE_SEARCH_TABLE}(rowid, name, description) '
+        'VALUES (new.id, new.name, new.description); END'
+    ),
+    f'{TITLE_SEARCH_TABLE}_ad': (
+        f'CREATE TRIGGER IF NOT EXISTS {TITLE_SEARCH_TABLE}_ad '
+        'AFTER DELETE ON reviews_title BEGIN '
+        f'INSERT INTO {TITLE_SEARCH_TABLE}'
+        f'({TITLE_SEARCH_TABLE}, rowid, name, description) '
+        "VALUES ('delete', old.id, old.name, old.description); END"
+    ),
+    f'{TITLE_SEARCH_TABLE}_au': (
+        f'CREATE TRIGGER IF NOT EXISTS {TITLE_SEARCH_TABLE}_au '
+        'AFTER UPDATE OF name, description ON reviews_title BEGIN '
+        f'INSERT INTO {TITLE_SEARCH_TABLE}'
+        f'({TITLE_SEARCH_TABLE}, rowid, name, description) '
+        "VALUES ('delete', old.id, old.name, old.description); "
+        f'INSERT INTO {TITLE_SEARCH_TABLE}(rowid, name, description) '
+        'VALUES (new.id, new.name, new.description); END'
+    ),
+}
+
+
+def install_title_search_triggers(using='default', **kwargs):
+    """Восстанавливает триггеры поискового индекса после миграций.
+
+    SQLite пересоздаёт таблицу при AlterField/AddField, и триггеры
+    reviews_title удаляются вместе со старой таблицей. Если какого-то
+    триггера не хватает, индекс перестраивается целиком.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+            " AND name LIKE %s",
+            [f'{TITLE_SEARCH_TABLE}%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if TITLE_SEARCH_TABLE not in existing:
+            return
+        missing = set(TITLE_SEARCH_TRIGGERS) - existing
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(TITLE_SEARCH_TRIGGERS[name])
+        cursor.execute(
+            f'INSERT INTO {TITLE_SEARCH_TABLE}({TITLE_SEARCH_TABLE}) '
+            "VALUES ('rebuild')"
+        )
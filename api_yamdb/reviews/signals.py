@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reviews.aggregates import update_score_histogram, update_title_rating
+from reviews.models import Review, Title, TitleRanking
+from reviews.queue import enqueue_title
+from reviews.ranking import update_title_ranking
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    score = int(instance.score)
+    if settings.REVIEW_AGGREGATES_DEFERRED:
+        if created or getattr(instance, '_loaded_score', None) != score:
+            enqueue_title(instance.title_id)
+        instance._loaded_score = score
+        return
+    if created:
+        update_title_rating(instance.title_id, score, 1)
+        update_title_ranking(instance.title_id, score, 1)
+        update_score_histogram(instance.title_id, {score: 1})
+    else:
+        old_score = getattr(instance, '_loaded_score', None)
+        if old_score is not None and old_score != score:
+            update_title_rating(instance.title_id, score - old_score, 0)
+            update_title_ranking(instance.title_id, score - old_score, 0)
+            update_score_histogram(
+                instance.title_id, {old_score: -1, score: 1}
+            )
+    instance._loaded_score = score
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    if settings.REVIEW_AGGREGATES_DEFERRED:
+        enqueue_title(instance.title_id)
+        return
+    update_title_rating(instance.title_id, -int(instance.score), -1)
+    update_title_ranking(instance.title_id, -int(instance.score), -1)
+    update_score_histogram(instance.title_id, {int(instance.score): -1})
+
+
+@receiver(post_save, sender=Title)
+def title_saved(sender, instance, created, **kwargs):
+    # Категория продублирована в рейтинге ради индекса по ней.
+    if not created:
+        TitleRanking.objects.filter(title_id=instance.pk).exclude(
+            category_id=instance.category_id
+        ).update(category_id=instance.category_id)
@@ -0,0 +1,52 @@
+"""Размер и стоимость сжатия ответов API.
+
+Для страниц списков разного размера печатается размер ответа без
+сжатия и с каждым доступным сжатием, время сжатия и время
+повторного анонимного запроса. Кэшируемые списки (/titles/) отдают
+сжатый вариант из кэша, остальные сжимаются на каждый запрос.
+"""
+from utils import TestDatabase, measure, populate_catalog, print_table
+
+from django.test import Client  # noqa: I100
+
+
+def main():
+    from api.compression import ENCODINGS, compress_content
+
+    with TestDatabase():
+        titles = populate_catalog(titles=500, reviews_per_title=40)
+        client = Client()
+        title_id = titles[0].pk
+        cases = [
+            (f'titles limit={limit}', f'/api/v1/titles/?limit={limit}')
+            for limit in (10, 100, 500)
+        ] + [
+            (
+                f'reviews limit={limit}',
+                f'/api/v1/titles/{title_id}/reviews/?limit={limit}'
+            )
+            for limit in (10, 40)
+        ]
+
+        rows = []
+        for name, url in cases:
+            content = client.get(url, HTTP_ACCEPT_ENCODING='identity').content
+            rows.append((name, 'identity', len(content), '-', '-'))
+            for encoding in ENCODINGS:
+                compressed = compress_content(content, encoding)
+                size = len(compressed) if compressed else len(content)
+                cpu = measure(lambda: compress_content(content, encoding))
+                request = measure(
+                    lambda: client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+                )
+                rows.append((
+                    name, encoding, size, f'{cpu:.3f}', f'{request:.3f}'
+                ))
+        print_table(
+            ('endpoint', 'encoding', 'bytes', 'compress ms', 'request ms'),
+            rows,
+        )
+
+
+if __name__ == '__main__':
+    main()
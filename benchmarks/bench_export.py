@@ -0,0 +1,71 @@
+"""Пиковая память выгрузки /titles/export/ при разном размере каталога.
+
+Ответ читается потоком и сразу отбрасывается, как это делает клиент;
+пик памяти не должен расти вместе с числом произведений.
+"""
+import time
+import tracemalloc
+
+from utils import TestDatabase, populate_catalog, print_table
+
+from django.test import Client  # noqa: I100
+
+
+def measure_export(client):
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get('/api/v1/titles/export/')
+    lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lines, elapsed, peak
+
+
+def add_titles(count):
+    from reviews.models import Category, Genre, Title
+
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    genre_ids = list(Genre.objects.values_list('pk', flat=True))
+    last = Title.objects.order_by('-pk').values_list('pk', flat=True)[0]
+    Title.objects.bulk_create(
+        (
+            Title(
+                name=f'Произведение {idx}',
+                year=1900 + idx % 120,
+                description='Описание ' * 20,
+                category_id=category_ids[idx % len(category_ids)],
+            )
+            for idx in range(count)
+        ),
+        batch_size=500,
+    )
+    Title.genre.through.objects.bulk_create(
+        (
+            Title.genre.through(
+                title_id=title_id,
+                genre_id=genre_ids[title_id % len(genre_ids)],
+            )
+            for title_id in range(last + 1, last + count + 1)
+        ),
+        batch_size=500,
+    )
+
+
+def main():
+    rows = []
+    with TestDatabase():
+        client = Client()
+        populate_catalog(titles=1000, reviews_per_title=1)
+        for added in (0, 9000, 40000):
+            if added:
+                add_titles(added)
+            lines, elapsed, peak = measure_export(client)
+            rows.append((
+                lines, f'{elapsed:.2f}', f'{peak / 1024 / 1024:.1f}'
+            ))
+    print_table(('titles', 'seconds', 'peak MiB'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Сравнение JSONRenderer и FastJSONRenderer.
+
+Меряется только рендеринг: данные ответа страницы списка берутся из
+``response.data`` и отрисовываются обоими классами.
+"""
+from utils import TestDatabase, measure, populate_catalog, print_table
+
+from rest_framework.renderers import JSONRenderer  # noqa: I100
+from rest_framework.test import APIClient
+
+
+def main():
+    from api.v1.renderers import FastJSONRenderer
+
+    with TestDatabase():
+        titles = populate_catalog(titles=500, reviews_per_title=40)
+        client = APIClient()
+        title_id = titles[0].pk
+        cases = [
+            (f'titles limit={limit}', f'/api/v1/titles/?limit={limit}')
+            for limit in (10, 100, 500)
+        ] + [
+            (
+                f'reviews limit={limit}',
+                f'/api/v1/titles/{title_id}/reviews/?limit={limit}'
+            )
+            for limit in (10, 40)
+        ]
+
+        rows = []
+        slow_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        for name, url in cases:
+            data = client.get(url).data
+            assert fast_renderer.render(data) == slow_renderer.render(data)
+            slow = measure(lambda: slow_renderer.render(data), repeat=50)
+            fast = measure(lambda: fast_renderer.render(data), repeat=50)
+            rows.append((
+                name, f'{slow:.3f}', f'{fast:.3f}', f'{slow / fast:.2f}x'
+            ))
+        print_table(('endpoint', 'json ms', 'orjson ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
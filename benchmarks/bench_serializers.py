@@ -0,0 +1,45 @@
+"""Сравнение ModelSerializer и быстрых сериализаторов списков.
+
+Меряется время GET-запроса страницы списка целиком (запросы к базе,
+сериализация, рендеринг) при API_FAST_SERIALIZERS = False/True.
+"""
+from utils import TestDatabase, measure, populate_catalog, print_table
+
+from django.test import override_settings  # noqa: I100
+from rest_framework.test import APIClient
+
+
+def main():
+    with TestDatabase():
+        titles = populate_catalog(titles=500, reviews_per_title=40)
+        from users.models import User
+        client = APIClient()
+        # Авторизованные запросы не попадают в кэш ответов.
+        client.force_authenticate(User.objects.first())
+        title_id = titles[0].pk
+        cases = [
+            (f'titles limit={limit}', f'/api/v1/titles/?limit={limit}')
+            for limit in (10, 100)
+        ] + [
+            (
+                f'reviews limit={limit}',
+                f'/api/v1/titles/{title_id}/reviews/?limit={limit}'
+            )
+            for limit in (10, 40)
+        ] + [('genres', '/api/v1/genres/')]
+
+        rows = []
+        for name, url in cases:
+            timings = []
+            for fast in (False, True):
+                with override_settings(API_FAST_SERIALIZERS=fast):
+                    timings.append(measure(lambda: client.get(url)))
+            slow, fast = timings
+            rows.append((
+                name, f'{slow:.2f}', f'{fast:.2f}', f'{slow / fast:.2f}x'
+            ))
+        print_table(('endpoint', 'model ms', 'fast ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Списки отзывов и комментариев длинных обсуждений до и после индексов.
+
+«До» — отдельные индексы по внешнему ключу, как было раньше: SQLite
+выбирает строки по ключу и сортирует их по дате. «После» — составные
+индексы (title, pub_date) и (review, pub_date), по которым строки
+читаются уже в порядке страницы.
+"""
+from utils import TestDatabase, measure, populate_catalog, print_table
+
+from django.db import connection, models  # noqa: I100
+from rest_framework.test import APIClient
+
+THREAD_SIZE = 20000
+
+
+def populate_threads(title):
+    from reviews.models import Comment, Review
+    from users.models import User
+
+    User.objects.bulk_create(
+        (
+            User(username=f'reader{idx}', email=f'reader{idx}@yamdb.fake')
+            for idx in range(THREAD_SIZE)
+        ),
+        batch_size=500,
+    )
+    Review.objects.bulk_create(
+        (
+            Review(
+                title=title, author=user, text=f'Отзыв {idx}',
+                score=1 + idx % 10,
+            )
+            for idx, user in enumerate(
+                User.objects.filter(username__startswith='reader')
+            )
+        ),
+        batch_size=500,
+    )
+    review = Review.objects.filter(title=title).first()
+    Comment.objects.bulk_create(
+        (
+            Comment(
+                review=review, author_id=review.author_id,
+                text=f'Комментарий {idx}',
+            )
+            for idx in range(THREAD_SIZE)
+        ),
+        batch_size=500,
+    )
+    return review
+
+
+def use_old_indexes():
+    from reviews.models import Comment, Review
+
+    with connection.schema_editor() as editor:
+        for model, field in ((Review, 'title'), (Comment, 'review')):
+            for index in model._meta.indexes:
+                if index.fields[0] == field:
+                    editor.remove_index(model, index)
+            editor.add_index(model, models.Index(
+                fields=(field,), name=f'bench_{field}_idx'
+            ))
+
+
+def main():
+    with TestDatabase():
+        title = populate_catalog(titles=500, reviews_per_title=5)[0]
+        review = populate_threads(title)
+        from users.models import User
+        client = APIClient()
+        # Авторизованные запросы не попадают в кэш ответов.
+        client.force_authenticate(User.objects.first())
+        reviews = f'/api/v1/titles/{title.pk}/reviews/'
+        comments = f'{reviews}{review.pk}/comments/'
+        cases = [
+            ('reviews first page', f'{reviews}?limit=10'),
+            ('reviews offset=10000', f'{reviews}?limit=10&offset=10000'),
+            ('comments first page', f'{comments}?limit=10'),
+            ('comments offset=10000', f'{comments}?limit=10&offset=10000'),
+        ]
+
+        timings = {}
+        for name, url in cases:
+            timings[name] = [measure(lambda: client.get(url))]
+        use_old_indexes()
+        for name, url in cases:
+            timings[name].append(measure(lambda: client.get(url)))
+
+        rows = []
+        for name, _ in cases:
+            after, before = timings[name]
+            rows.append((
+                name, f'{before:.2f}', f'{after:.2f}',
+                f'{before / after:.2f}x'
+            ))
+        print_table(('endpoint', 'before ms', 'after ms', 'speedup'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Общая подготовка окружения для бенчмарков.
+
+Бенчмарки запускаются из корня репозитория, например::
+
+    python benchmarks/bench_serializers.py
+
+и работают на временной тестовой базе, не затрагивая db.sqlite3.
+"""
+import os
+import statistics
+import sys
+import time
+
+PROJECT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_yamdb'
+)
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import (setup_test_environment,  # noqa: E402
+                               teardown_test_environment)
+
+
+class TestDatabase:
+    """Контекст с мигрированной временной базой данных."""
+
+    def __enter__(self):
+        setup_test_environment()
+        self.old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, keepdb=False)
+        return connection
+
+    def __exit__(self, *exc_info):
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=20, warmup=2):
+    """Медиана времени вызова ``func`` в миллисекундах."""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def print_table(header, rows):
+    widths = [
+        max(len(str(row[index])) for row in [header, *rows])
+        for index in range(len(header))
+    ]
+    for row in [header, *rows]:
+        print('  '.join(
+            str(cell).rjust(width) for cell, width in zip(row, widths)
+        ))
+
+
+def populate_catalog(titles=500, genres=10, categories=5, users=50,
+                     reviews_per_title=5):
+    """Заполняет базу произведениями, отзывами и пользователями."""
+    from reviews.models import Category, Genre, Review, Title
+    from users.models import User
+
+    # SQLite не возвращает id из bulk_create, поэтому объекты
+    # перечитываются из базы.
+    Category.objects.bulk_create(
+        Category(name=f'Категория {idx}', slug=f'category-{idx}')
+        for idx in range(categories)
+    )
+    Genre.objects.bulk_create(
+        Genre(name=f'Жанр {idx}', slug=f'genre-{idx}')
+        for idx in range(genres)
+    )
+    User.objects.bulk_create(
+        User(username=f'user{idx}', email=f'user{idx}@yamdb.fake')
+        for idx in range(users)
+    )
+    category_objs = list(Category.objects.order_by('pk'))
+    genre_objs = list(Genre.objects.order_by('pk'))
+    user_objs = list(User.objects.order_by('pk'))
+    Title.objects.bulk_create(
+        Title(
+            name=f'Произведение {idx}',
+            year=1900 + idx % 120,
+            description='Описание ' * 20,
+            category=category_objs[idx % categories],
+        )
+        for idx in range(titles)
+    )
+    title_objs = list(Title.objects.order_by('pk'))
+    Title.genre.through.objects.bulk_create(
+        Title.genre.through(
+            title_id=title.pk,
+            genre_id=genre_objs[(title.pk + shift) % genres].pk,
+        )
+        for title in title_objs for shift in range(3)
+    )
+    Review.objects.bulk_create(
+        Review(
+            title=title,
+            author=user_objs[(title.pk + idx) % users],
+            text=f'Отзыв {idx}',
+            score=1 + (title.pk + idx) % 10,
+        )
+        for title in title_objs for idx in range(reviews_per_title)
+    )
+    from reviews.aggregates import recalculate_ratings
+    recalculate_ratings()
+    return title_objs
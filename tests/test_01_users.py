@@ -2,7 +2,8 @@ from http import HTTPStatus
 
 import pytest
 
-from tests.utils import (check_pagination,
+from tests.utils import (check_pagination, create_single_comment,
+                         create_single_review, create_titles,
                          invalid_data_for_user_patch_and_creation)
 
 
@@ -552,3 +553,93 @@ class Test01UserAPI:
             'Проверьте, что PATCH-запрос к `/api/v1/users/me/` с ключом '
             '`role` не изменяет роль пользователя.'
         )
+
+    @pytest.mark.parametrize('fast', (True, False))
+    def test_11_users_reviews_feed(self, fast, client, admin_client, user,
+                                   user_client, moderator_client, settings):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from reviews.models import Review
+
+        settings.API_FAST_SERIALIZERS = fast
+        titles, _, _ = create_titles(admin_client)
+        for idx in range(3):
+            titles.append(admin_client.post('/api/v1/titles/', data={
+                'name': f'Ещё {idx}', 'year': 2000,
+                'category': titles[0]['category'],
+            }).json())
+        review_ids = [
+            create_single_review(
+                user_client, title['id'], f'Отзыв {idx}', 5
+            ).json()['id']
+            for idx, title in enumerate(titles)
+        ]
+        create_single_review(moderator_client, titles[0]['id'], 'Чужой', 1)
+        for idx in range(3):
+            create_single_comment(
+                user_client, titles[0]['id'], review_ids[0], f'Ответ {idx}'
+            )
+
+        url = '/api/v1/users/me/reviews/'
+        assert client.get(url).status_code == HTTPStatus.UNAUTHORIZED
+        response = user_client.get(url, {'limit': 2})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Эндпоинт `{url}` не найден или недоступен пользователю.'
+        )
+        seen = []
+        while True:
+            data = response.json()
+            assert set(data) == {'next', 'previous', 'results'}, (
+                f'Проверьте, что `{url}` использует курсорную пагинацию.'
+            )
+            seen.extend(review['id'] for review in data['results'])
+            if not data['next']:
+                break
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get(data['next'])
+            page_sql = queries.captured_queries[-1]['sql']
+            assert 'OFFSET' not in page_sql and 'COUNT' not in page_sql
+        assert seen == review_ids[::-1], (
+            f'Проверьте, что `{url}` возвращает отзывы пользователя от '
+            'новых к старым.'
+        )
+
+        url = f'/api/v1/users/{user.username}/reviews/'
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что `{url}` доступен без авторизации.'
+        )
+        assert [
+            review['id'] for review in response.json()['results']
+        ] == review_ids[::-1]
+        assert response.json()['results'][0]['author'] == user.username
+        assert response.json()['results'][0]['title'] == titles[-1]['name']
+        assert client.get(
+            '/api/v1/users/nobody/reviews/'
+        ).status_code == HTTPStatus.NOT_FOUND
+
+        response = client.get(f'/api/v1/users/{user.username}/comments/')
+        assert [
+            comment['text'] for comment in response.json()['results']
+        ] == ['Ответ 2', 'Ответ 1', 'Ответ 0']
+        assert response.json()['results'][0]['review'] == 'Отзыв 0'
+        response = user_client.get('/api/v1/users/me/comments/')
+        assert len(response.json()['results']) == 3
+
+        last = Review.objects.get(pk=review_ids[1])
+        plan = ' '.join(
+            str(row) for row in Review.objects.filter(
+                author=user
+            ).filter(
+                pub_date__lte=last.pub_date
+            ).order_by('-pub_date', '-pk')[:10].explain().splitlines()
+        )
+        assert 'review_author_pub_date_idx' in plan, (
+            'Проверьте, что отзывы автора выбираются по индексу '
+            f'(author, pub_date). План запроса: {plan}'
+        )
+        assert 'TEMP B-TREE' not in plan, (
+            'Проверьте, что отзывы автора не сортируются отдельно от '
+            f'чтения индекса. План запроса: {plan}'
+        )
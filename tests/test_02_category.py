@@ -3,7 +3,8 @@ from http import HTTPStatus
 import pytest
 
 from tests.utils import (check_name_and_slug_patterns, check_pagination,
-                         check_permissions, create_categories)
+                         check_permissions, create_categories,
+                         create_single_review, create_titles)
 
 
 @pytest.mark.django_db(transaction=True)
@@ -139,3 +140,52 @@ class Test02CategoryAPI:
                           HTTPStatus.FORBIDDEN)
         check_permissions(moderator_client, url, data, 'модератора',
                           categories, HTTPStatus.FORBIDDEN)
+
+    def test_06_category_stats(self, client, admin_client, user_client,
+                               moderator_client, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 10)
+        create_single_review(moderator_client, titles[0]['id'], 'Хорошо', 7)
+        create_single_review(admin_client, titles[1]['id'], 'Так себе', 4)
+
+        url = '/api/v1/categories/stats/'
+        with django_assert_num_queries(1):
+            response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{url}` доступен без авторизации.'
+        )
+        assert response.json() == [
+            {
+                'name': 'Книги', 'slug': 'books', 'title_count': 1,
+                'review_count': 1, 'mean_score': 4.0,
+            },
+            {
+                'name': 'Фильм', 'slug': 'films', 'title_count': 1,
+                'review_count': 2, 'mean_score': 8.5,
+            },
+        ], (
+            f'Проверьте, что эндпоинт `{url}` возвращает число произведений, '
+            'число отзывов и среднюю оценку для каждой категории.'
+        )
+        with django_assert_num_queries(0):
+            client.get(url)
+        with django_assert_num_queries(1):
+            response = admin_client.get(url)
+        assert len(response.json()) == 2, (
+            f'Проверьте, что сводка эндпоинта `{url}` кэшируется и для '
+            'авторизованных пользователей.'
+        )
+
+        admin_client.post('/api/v1/categories/', data={
+            'name': 'Музыка', 'slug': 'music'
+        })
+        create_single_review(admin_client, titles[0]['id'], 'Плохо', 1)
+        response = client.get(url)
+        assert response.json()[1] == {
+            'name': 'Музыка', 'slug': 'music', 'title_count': 0,
+            'review_count': 0, 'mean_score': None,
+        }
+        assert response.json()[2]['review_count'] == 3, (
+            f'Проверьте, что сводка эндпоинта `{url}` обновляется после '
+            'добавления отзыва.'
+        )
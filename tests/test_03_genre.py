@@ -3,7 +3,8 @@ from http import HTTPStatus
 import pytest
 
 from tests.utils import (check_name_and_slug_patterns, check_pagination,
-                         check_permissions, create_genre)
+                         check_permissions, create_genre,
+                         create_single_review, create_titles)
 
 
 @pytest.mark.django_db(transaction=True)
@@ -122,3 +123,54 @@ class Test03GenreAPI:
                           HTTPStatus.FORBIDDEN)
         check_permissions(moderator_client, url, data, 'модератора',
                           genres, HTTPStatus.FORBIDDEN)
+
+    def test_06_genre_stats(self, client, admin_client, user_client,
+                            moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 10)
+        create_single_review(moderator_client, titles[0]['id'], 'Хорошо', 7)
+        create_single_review(admin_client, titles[1]['id'], 'Так себе', 4)
+
+        url = '/api/v1/genres/stats/'
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{url}` доступен без авторизации.'
+        )
+        assert [
+            (row['slug'], row['title_count'], row['review_count'],
+             row['mean_score'])
+            for row in response.json()
+        ] == [
+            ('drama', 1, 1, 4.0),
+            ('comedy', 1, 2, 8.5),
+            ('horror', 1, 2, 8.5),
+        ], (
+            f'Проверьте, что эндпоинт `{url}` возвращает число произведений, '
+            'число отзывов и среднюю оценку для каждого жанра.'
+        )
+
+        admin_client.patch(
+            f'/api/v1/titles/{titles[1]["id"]}/', data={'genre': ['comedy']}
+        )
+        response = client.get(url)
+        assert response.json()[1]['title_count'] == 2, (
+            f'Проверьте, что сводка эндпоинта `{url}` обновляется после '
+            'изменения жанров произведения.'
+        )
+        assert response.json()[1]['mean_score'] == 7.0
+
+    def test_07_genres_cache_media_type_params(self, client, admin_client):
+        create_genre(admin_client)
+        url = '/api/v1/genres/'
+
+        indented = client.get(url, HTTP_ACCEPT='application/json; indent=4')
+        plain = client.get(url, HTTP_ACCEPT='application/json')
+        assert b'\n    ' in indented.content
+        assert b'\n' not in plain.content, (
+            f'Проверьте, что кэш ответов `{url}` учитывает параметры типа '
+            'ответа из заголовка Accept.'
+        )
+        assert indented['ETag'] != plain['ETag'], (
+            f'Проверьте, что `ETag` ответа `{url}` зависит от параметров '
+            'типа ответа из заголовка Accept.'
+        )
@@ -1,9 +1,17 @@
 from http import HTTPStatus
 
+from io import StringIO
+
 import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from tests.utils import (check_pagination, check_permissions,
-                         create_categories, create_genre, create_titles)
+                         create_categories, create_genre,
+                         create_single_review, create_titles, make_cursor,
+                         read_ndjson)
 
 
 @pytest.mark.django_db(transaction=True)
@@ -316,3 +324,1134 @@ class Test04TitleAPI:
                           HTTPStatus.FORBIDDEN)
         check_permissions(moderator_client, url, data, 'модератора',
                           titles, HTTPStatus.FORBIDDEN)
+
+    def test_06_titles_list_query_count(self, client, admin_client,
+                                        django_assert_num_queries):
+        titles, categories, genres = create_titles(admin_client)
+        for idx in range(10):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {idx}',
+                'year': 2000 + idx,
+                'genre': [genre['slug'] for genre in genres],
+                'category': categories[idx % 2]['slug'],
+            })
+        url = '/api/v1/titles/'
+
+        for limit, queries in ((1, 4), (5, 2), (12, 2)):
+            # Версия отзывов из базы данных и COUNT(*) запрашиваются один
+            # раз, дальше они берутся из кэша.
+            with django_assert_num_queries(queries):
+                response = client.get(f'{url}?limit={limit}')
+            assert response.status_code == HTTPStatus.OK
+            assert len(response.json()['results']) == limit, (
+                f'Проверьте, что эндпоинт `{url}` поддерживает параметр '
+                '`limit`.'
+            )
+
+        with django_assert_num_queries(3):
+            response = client.get(f'{url}{titles[0]["id"]}/')
+        assert response.json().get('genre'), (
+            f'Проверьте, что ответ на GET-запрос к `{url}{{title_id}}/` '
+            'содержит жанры произведения.'
+        )
+
+    def test_07_titles_cursor_pagination(self, client, admin_client):
+        _, categories, genres = create_titles(admin_client)
+        for idx in range(7):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {idx}',
+                'year': 2000 + idx % 3,
+                'genre': [genres[0]['slug']],
+                'category': categories[0]['slug'],
+            })
+        url = '/api/v1/titles/'
+        expected = [
+            title['id'] for title in client.get(f'{url}?limit=100').json()[
+                'results'
+            ]
+        ]
+
+        response = client.get(f'{url}?pagination=cursor&limit=2')
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert 'count' not in data and data['previous'] is None, (
+            f'Проверьте, что `{url}?pagination=cursor` возвращает первую '
+            'страницу курсорной пагинации.'
+        )
+        pages = [data]
+        while data['next']:
+            data = client.get(data['next']).json()
+            pages.append(data)
+        walked = [title['id'] for page in pages for title in page['results']]
+        assert walked == expected, (
+            f'Проверьте, что курсорная пагинация `{url}` возвращает все '
+            'произведения в порядке по умолчанию без повторов и пропусков.'
+        )
+
+        walked_back = [title['id'] for title in data['results']]
+        while data['previous']:
+            data = client.get(data['previous']).json()
+            walked_back = [
+                title['id'] for title in data['results']
+            ] + walked_back
+        assert walked_back == expected, (
+            f'Проверьте, что ссылки `previous` курсорной пагинации `{url}` '
+            'возвращают предыдущие страницы.'
+        )
+
+        response = client.get(f'{url}?cursor=broken')
+        assert response.status_code == HTTPStatus.NOT_FOUND, (
+            f'Проверьте, что некорректный курсор в запросе к `{url}` '
+            'возвращает ответ со статусом 404.'
+        )
+        for position in (
+            [{'year': 2000}, 'Произведение', 1],
+            ['abc', 'Произведение', 1],
+            [10 ** 23, 'Произведение', 1],
+            [2000, 'Произведение', 10 ** 23],
+        ):
+            response = client.get(url, {'cursor': make_cursor(position)})
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                f'Проверьте, что курсор с некорректными значениями полей '
+                f'сортировки в запросе к `{url}` возвращает ответ со '
+                f'статусом 404: {position}.'
+            )
+
+        response = client.get(f'{url}?limit=2')
+        assert response.json().get('count') == len(expected), (
+            f'Проверьте, что без параметра `pagination` эндпоинт `{url}` '
+            'использует пагинацию limit/offset.'
+        )
+
+    def test_08_titles_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+
+        def search(value):
+            response = client.get(url, {'search': value})
+            assert response.status_code == HTTPStatus.OK
+            return [title['id'] for title in response.json()['results']]
+
+        assert search('терминат') == [titles[0]['id']], (
+            f'Проверьте, что эндпоинт `{url}` поддерживает полнотекстовый '
+            'поиск по началу слова в названии произведения.'
+        )
+        assert search('yippie') == [titles[1]['id']], (
+            f'Проверьте, что полнотекстовый поиск `{url}` учитывает '
+            'описание произведения.'
+        )
+        assert search('"') == [titles[1]['id'], titles[0]['id']], (
+            f'Проверьте, что поиск `{url}` без слов не фильтрует список.'
+        )
+
+        admin_client.patch(
+            f'{url}{titles[0]["id"]}/', data={'name': 'Чужой'}
+        )
+        assert search('терминат') == [], (
+            'Проверьте, что поисковый индекс обновляется при изменении '
+            'названия произведения.'
+        )
+        assert search('чужой') == [titles[0]['id']], (
+            'Проверьте, что поисковый индекс обновляется при изменении '
+            'названия произведения.'
+        )
+
+        admin_client.delete(f'{url}{titles[0]["id"]}/')
+        assert search('чужой') == [], (
+            'Проверьте, что произведение удаляется из поискового индекса.'
+        )
+
+        response = client.get(url, {'name': 'орешек'})
+        assert len(response.json()['results']) == 1, (
+            f'Проверьте, что фильтр `name` эндпоинта `{url}` продолжает '
+            'работать.'
+        )
+
+        ids = [
+            admin_client.post(url, data={
+                'name': name,
+                'year': 2000,
+                'genre': titles[1]['genre'],
+                'category': titles[1]['category'],
+            }).json()['id']
+            for name in ('Кот', 'Кот, кот и ещё кот')
+        ]
+        assert search('кот') == ids[::-1], (
+            f'Проверьте, что результаты поиска `{url}` упорядочены по '
+            'релевантности.'
+        )
+
+    def test_09_titles_year_filter(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+
+        def filter_ids(params):
+            response = client.get(url, params)
+            assert response.status_code == HTTPStatus.OK
+            return {title['id'] for title in response.json()['results']}
+
+        assert filter_ids({'year': 198}) == set(), (
+            f'Проверьте, что фильтр `year` эндпоинта `{url}` ищет точное '
+            'совпадение года, а не подстроку.'
+        )
+        assert filter_ids({'year': 1984}) == {titles[0]['id']}
+        assert filter_ids({'year_min': 1985}) == {titles[1]['id']}, (
+            f'Проверьте, что эндпоинт `{url}` поддерживает фильтр '
+            '`year_min`.'
+        )
+        assert filter_ids({'year_max': 1985}) == {titles[0]['id']}, (
+            f'Проверьте, что эндпоинт `{url}` поддерживает фильтр '
+            '`year_max`.'
+        )
+        assert filter_ids({'year_min': 1984, 'year_max': 1988}) == {
+            title['id'] for title in titles
+        }
+        for params in (
+            {'year': '9' * 23},
+            {'year_min': '9' * 23},
+            {'year_max': -1},
+            {'year': 1984.5},
+        ):
+            response = client.get(url, params)
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что фильтры года эндпоинта `{url}` отклоняют '
+                f'значения вне допустимого диапазона: {params}.'
+            )
+
+    @pytest.mark.skipif(
+        connection.vendor != 'sqlite', reason='План запроса SQLite'
+    )
+    def test_10_titles_year_filter_uses_index(self):
+        from api.v1.filters import TitleFilter
+        from reviews.models import Title
+
+        for params in (
+            {'year': 1984},
+            {'year_min': 1980, 'year_max': 1990},
+        ):
+            plan = TitleFilter(
+                params, queryset=Title.objects.all()
+            ).qs.explain()
+            assert 'USING INDEX reviews_title_year' in plan, (
+                'Проверьте, что фильтрация произведений по году использует '
+                f'индекс по полю `year`. План запроса: {plan}'
+            )
+
+    @pytest.mark.parametrize('backend', ('locmem', 'filebased'))
+    def test_11_titles_anonymous_cache(self, backend, client, admin_client,
+                                       user_client, settings, tmp_path,
+                                       django_assert_num_queries):
+        if backend == 'filebased':
+            settings.CACHES = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': str(tmp_path),
+            }}
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        detail_url = f'{url}{titles[0]["id"]}/'
+
+        first = client.get(f'{url}?limit=1&offset=0&ordering=name')
+        with django_assert_num_queries(0):
+            second = client.get(f'{url}?ordering=name&offset=0&limit=1')
+        assert second.status_code == HTTPStatus.OK
+        assert second.json() == first.json(), (
+            f'Проверьте, что повторный анонимный GET-запрос к `{url}` '
+            'возвращается из кэша без обращений к базе данных.'
+        )
+
+        client.get(detail_url)
+        with django_assert_num_queries(0):
+            assert client.get(detail_url).json()['rating'] is None
+
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 9)
+        assert client.get(detail_url).json()['rating'] == 9, (
+            'Проверьте, что после создания отзыва кэш произведения '
+            'сбрасывается.'
+        )
+
+        admin_client.patch(detail_url, data={'genre': ['drama']})
+        genres = client.get(detail_url).json()['genre']
+        assert [genre['slug'] for genre in genres] == ['drama'], (
+            'Проверьте, что после изменения жанров произведения кэш '
+            'сбрасывается.'
+        )
+
+        admin_client.delete('/api/v1/categories/films/')
+        assert client.get(detail_url).json()['category'] is None, (
+            'Проверьте, что после удаления категории кэш произведений '
+            'сбрасывается.'
+        )
+        response = client.get('/api/v1/categories/')
+        assert response.json()['count'] == 1
+
+        admin_client.delete(detail_url)
+        assert client.get(detail_url).status_code == HTTPStatus.NOT_FOUND
+
+        user_client.get(f'{url}?ordering=name&limit=1')
+        # Из кэша берётся только число записей, страница читается заново.
+        with django_assert_num_queries(3):
+            response = user_client.get(f'{url}?ordering=name&limit=1')
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что запросы авторизованных пользователей не '
+            'обслуживаются из кэша.'
+        )
+
+        from django.db import transaction
+        from django.test import Client
+
+        from api.v1.cache import get_versions
+        from reviews.models import Genre
+
+        tokens = set()
+        for _ in range(2):
+            response = Client().get(url, HTTP_ACCEPT='text/html')
+            assert 'csrftoken' in response.cookies, (
+                'Проверьте, что HTML-ответы Browsable API не берутся из '
+                'кэша: каждый клиент должен получить свой CSRF-токен.'
+            )
+            tokens.add(response.cookies['csrftoken'].value)
+        assert len(tokens) == 2
+
+        versions = get_versions(('genre',))
+        with transaction.atomic():
+            Genre.objects.create(name='Триллер', slug='thriller')
+            assert get_versions(('genre',)) == versions, (
+                'Проверьте, что версия модели в кэше увеличивается только '
+                'после фиксации транзакции.'
+            )
+        assert get_versions(('genre',)) != versions
+
+    def test_12_titles_conditional_requests(self, client, admin_client,
+                                            user_client, settings,
+                                            django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        detail_url = f'{url}{titles[0]["id"]}/'
+
+        for endpoint in (url, detail_url, '/api/v1/categories/'):
+            response = client.get(endpoint)
+            etag = response.get('ETag')
+            assert etag and response.get('Last-Modified'), (
+                f'Проверьте, что ответ на GET-запрос к `{endpoint}` '
+                'содержит заголовки `ETag` и `Last-Modified`.'
+            )
+            response = client.get(endpoint, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                f'Проверьте, что GET-запрос к `{endpoint}` с актуальным '
+                '`If-None-Match` возвращает ответ со статусом 304.'
+            )
+            assert response.get('ETag') == etag
+            response = client.get(
+                endpoint,
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+            assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                f'Проверьте, что GET-запрос к `{endpoint}` с актуальным '
+                '`If-Modified-Since` возвращает ответ со статусом 304.'
+            )
+
+        etag = user_client.get(detail_url)['ETag']
+        with django_assert_num_queries(2):
+            response = user_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            'Проверьте, что ответ 304 формируется без сериализации '
+            'произведения.'
+        )
+
+        etag = client.get(detail_url)['ETag']
+        list_etag = client.get(url)['ETag']
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 9)
+        response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после создания отзыва `ETag` произведения '
+            'меняется.'
+        )
+        assert response.json()['rating'] == 9
+        response = client.get(url, HTTP_IF_NONE_MATCH=list_etag)
+        assert response.status_code == HTTPStatus.OK
+
+        etag = client.get(url)['ETag']
+        admin_client.delete(f'{url}{titles[1]["id"]}/')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после удаления произведения `ETag` списка '
+            'меняется.'
+        )
+        assert response.json()['count'] == 1
+
+        from django.db.models import F
+
+        from reviews.models import DataVersion
+
+        # Другой процесс меняет версию только в базе данных; этот процесс
+        # видит её, когда истекает срок кэширования версий.
+        settings.API_VERSIONS_MAX_AGE = 0
+        cache.clear()
+        etag = client.get(url)['ETag']
+        DataVersion.objects.filter(name='title').update(
+            version=F('version') + 1
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что `ETag` списка зависит от версий моделей в базе '
+            'данных, а не только в кэше процесса.'
+        )
+
+    def test_13_titles_multi_genre_filter(self, client, admin_client,
+                                          settings):
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        response = admin_client.post(url, data={
+            'name': 'Титаник',
+            'year': 1997,
+            'genre': [genres[1]['slug'], genres[2]['slug']],
+            'category': categories[0]['slug'],
+        })
+        titles.append(response.json())
+
+        def filter_ids(params):
+            response = client.get(url, params)
+            assert response.status_code == HTTPStatus.OK
+            return {title['id'] for title in response.json()['results']}
+
+        horror, comedy, drama = (genre['slug'] for genre in genres)
+        assert filter_ids({'genre': comedy}) == {
+            titles[0]['id'], titles[2]['id']
+        }
+        assert filter_ids({'genre': f'{horror},{drama}'}) == {
+            title['id'] for title in titles
+        }, (
+            f'Проверьте, что фильтр `genre` эндпоинта `{url}` с несколькими '
+            'жанрами по умолчанию возвращает произведения любого из них.'
+        )
+        assert filter_ids(
+            {'genre': f'{comedy},{drama}', 'genre_mode': 'all'}
+        ) == {titles[2]['id']}, (
+            f'Проверьте, что фильтр `genre` эндпоинта `{url}` с параметром '
+            '`genre_mode=all` возвращает произведения всех указанных жанров.'
+        )
+        assert filter_ids({'genre': 'unknown'}) == set()
+        response = client.get(url, {'genre': comedy, 'genre_mode': 'some'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        admin_client.patch(
+            f'{url}{titles[1]["id"]}/', data={'genre': [comedy, drama]}
+        )
+        assert filter_ids(
+            {'genre': f'{comedy},{drama}', 'genre_mode': 'all'}
+        ) == {titles[1]['id'], titles[2]['id']}, (
+            'Проверьте, что индекс жанров обновляется при изменении жанров '
+            'произведения.'
+        )
+
+        # Большие результаты фильтруются подзапросом в базе данных.
+        cases = [
+            {'genre': comedy},
+            {'genre': f'{horror},{drama}'},
+            {'genre': f'{comedy},{drama}', 'genre_mode': 'all'},
+            {'genre': f'{comedy},unknown'},
+            {'genre': f'{comedy},unknown', 'genre_mode': 'all'},
+        ]
+        expected = [filter_ids(params) for params in cases]
+        settings.API_GENRE_FILTER_MAX_IDS = 0
+        cache.clear()
+        assert [filter_ids(params) for params in cases] == expected, (
+            f'Проверьте, что фильтр `genre` эндпоинта `{url}` для больших '
+            'результатов возвращает те же произведения.'
+        )
+        assert expected[2] == {titles[1]['id'], titles[2]['id']}
+        assert expected[4] == set()
+
+    def test_14_titles_sparse_fieldsets(self, client, admin_client,
+                                        django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = '/api/v1/titles/'
+
+        with django_assert_num_queries(3) as captured:
+            response = client.get(url, {'fields': 'id,name,rating'})
+        assert response.status_code == HTTPStatus.OK
+        for title in response.json()['results']:
+            assert set(title) == {'id', 'name', 'rating'}, (
+                f'Проверьте, что параметр `fields` эндпоинта `{url}` '
+                'оставляет в ответе только перечисленные поля.'
+            )
+        page_sql = captured.captured_queries[-1]['sql']
+        assert 'description' not in page_sql and 'genre' not in page_sql, (
+            f'Проверьте, что при запросе к `{url}` с параметром `fields` '
+            'из базы данных загружаются только нужные колонки.'
+        )
+
+        response = client.get(
+            f'{url}{titles[0]["id"]}/',
+            {'omit': 'description,genre,score_distribution'}
+        )
+        assert set(response.json()) == {
+            'id', 'name', 'year', 'rating', 'category'
+        }, (
+            f'Проверьте, что параметр `omit` эндпоинта `{url}{{title_id}}/` '
+            'убирает перечисленные поля из ответа.'
+        )
+        assert set(response.json()['category']) == {'name', 'slug'}
+
+        response = client.get(url, {'fields': 'genre,unknown'})
+        assert [set(title) for title in response.json()['results']] == [
+            {'genre'}, {'genre'}
+        ]
+        assert response.json()['results'][0]['genre']
+
+    def test_15_titles_top(self, client, admin_client, user_client,
+                           moderator_client):
+        titles, categories, genres = create_titles(admin_client)
+        for name in ('Без отзывов', 'Провал'):
+            response = admin_client.post('/api/v1/titles/', data={
+                'name': name,
+                'year': 2000,
+                'genre': [genres[0]['slug']],
+                'category': categories[0]['slug'],
+            })
+            assert response.status_code == HTTPStatus.CREATED
+        single, popular = titles
+        failure = response.json()
+        url = '/api/v1/titles/top/'
+        create_single_review(user_client, single['id'], 'Шедевр', 10)
+        assert client.get(url).json()['results'][0][
+            'weighted_rating'
+        ] == 10, (
+            f'Проверьте, что рейтинг `{url}`, построенный без отзывов, '
+            'берёт среднюю оценку по первым отзывам, а не 0.'
+        )
+        for author_client in (admin_client, user_client, moderator_client):
+            create_single_review(author_client, popular['id'], 'Отлично', 9)
+            create_single_review(author_client, failure['id'], 'Ужасно', 1)
+
+        def top_ids(params=None):
+            response = client.get(url, params)
+            assert response.status_code == HTTPStatus.OK
+            return [title['id'] for title in response.json()['results']]
+
+        from reviews.models import RankingTotals
+
+        assert RankingTotals.objects.get().needs_rebuild, (
+            'Проверьте, что при уходе средней оценки дальше '
+            'RATING_PRIOR_TOLERANCE рейтинг помечается для перестройки, '
+            'а не перестраивается при записи отзыва.'
+        )
+        call_command('rebuild_rankings', '--if-needed', stdout=StringIO())
+        assert not RankingTotals.objects.get().needs_rebuild
+
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{url}` доступен без авторизации.'
+        )
+        results = response.json()['results']
+        assert [title['id'] for title in results] == [
+            popular['id'], single['id'], failure['id']
+        ], (
+            f'Проверьте, что эндпоинт `{url}` сортирует произведения по '
+            'байесовской оценке и не включает произведения без отзывов.'
+        )
+        assert results[0]['rating'] == 9
+        assert results[0]['weighted_rating'] > results[1]['weighted_rating']
+
+        assert top_ids({'category': categories[0]['slug']}) == [
+            single['id'], failure['id']
+        ], f'Проверьте фильтрацию эндпоинта `{url}` по категории.'
+        assert top_ids({'genre': genres[2]['slug']}) == [popular['id']], (
+            f'Проверьте фильтрацию эндпоинта `{url}` по жанру.'
+        )
+
+        response = admin_client.patch(
+            f'/api/v1/titles/{popular["id"]}/',
+            data={'category': categories[0]['slug']}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert top_ids({'category': categories[0]['slug']}) == [
+            popular['id'], single['id'], failure['id']
+        ], 'Проверьте, что рейтинг учитывает смену категории произведения.'
+
+        # Средняя оценка меняется меньше RATING_PRIOR_TOLERANCE.
+        create_single_review(admin_client, single['id'], 'Неплохо', 6)
+        assert not RankingTotals.objects.get().needs_rebuild
+        before = client.get(url).json()['results']
+        call_command('rebuild_rankings', stdout=StringIO())
+        after = client.get(url).json()['results']
+        assert [
+            (title['id'], pytest.approx(title['weighted_rating'], abs=0.05))
+            for title in after
+        ] == [
+            (title['id'], title['weighted_rating']) for title in before
+        ], (
+            'Проверьте, что команда `rebuild_rankings` строит тот же рейтинг, '
+            'что и инкрементальные обновления.'
+        )
+
+        reviews = client.get(
+            f'/api/v1/titles/{single["id"]}/reviews/'
+        ).json()['results']
+        for review in reviews:
+            admin_client.delete(
+                f'/api/v1/titles/{single["id"]}/reviews/{review["id"]}/'
+            )
+        assert top_ids() == [popular['id'], failure['id']], (
+            'Проверьте, что произведение без отзывов исключается из рейтинга.'
+        )
+
+    def test_16_titles_batch(self, client, admin_client, user_client,
+                             django_assert_max_num_queries):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        url = '/api/v1/titles/batch/'
+
+        def make_batch(size):
+            return [
+                {
+                    'name': f'Произведение {idx}',
+                    'year': 1990 + idx,
+                    'genre': [genres[idx % 3]['slug'], genres[2]['slug']],
+                    'category': categories[idx % 2]['slug'],
+                }
+                for idx in range(size)
+            ]
+
+        response = user_client.post(url, data=make_batch(1), format='json')
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            f'Проверьте, что POST-запрос к `{url}` доступен только '
+            'администратору.'
+        )
+
+        for size in (2, 20):
+            with django_assert_max_num_queries(13):
+                response = admin_client.post(
+                    url, data=make_batch(size), format='json'
+                )
+            assert response.status_code == HTTPStatus.CREATED, (
+                f'Проверьте, что POST-запрос администратора к `{url}` со '
+                'списком корректных произведений возвращает статус 201, а '
+                'число запросов к базе данных не зависит от размера пакета.'
+            )
+        created = response.json()
+        assert len(created) == 20
+        assert created[3]['name'] == 'Произведение 3'
+        assert created[3]['category']['slug'] == categories[1]['slug']
+        assert {genre['slug'] for genre in created[3]['genre']} == {
+            genres[0]['slug'], genres[2]['slug']
+        }
+        detail = client.get(f'/api/v1/titles/{created[4]["id"]}/').json()
+        detail.pop('score_distribution')
+        assert detail == created[4], (
+            f'Проверьте, что произведения из `{url}` сохраняются вместе '
+            'с жанрами.'
+        )
+        response = client.get('/api/v1/titles/', {'genre': genres[1]['slug']})
+        assert response.json()['count'] == 8, (
+            f'Проверьте, что после записи через `{url}` фильтр по жанру '
+            'учитывает новые произведения.'
+        )
+
+        total = client.get('/api/v1/titles/').json()['count']
+        batch = make_batch(3)
+        batch[1]['year'] = 3000
+        batch[2]['genre'] = ['unknown']
+        response = admin_client.post(url, data=batch, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = response.json()
+        assert len(errors) == 3 and not errors[0], (
+            f'Проверьте, что при ошибках `{url}` возвращает ошибки для '
+            'каждого элемента списка по порядку.'
+        )
+        assert 'year' in errors[1] and 'genre' in errors[2]
+        assert client.get('/api/v1/titles/').json()['count'] == total, (
+            f'Проверьте, что при ошибках `{url}` не сохраняет ни одного '
+            'произведения.'
+        )
+
+        response = admin_client.post(url, data=[{
+            'id': created[0]['id'],
+            'name': 'Новое название',
+            'year': 2001,
+            'genre': [genres[1]['slug']],
+            'category': categories[1]['slug'],
+        }, *make_batch(1)], format='json')
+        assert response.status_code == HTTPStatus.CREATED
+        detail = client.get(f'/api/v1/titles/{created[0]["id"]}/').json()
+        assert (detail['name'], detail['genre'], detail['category']) == (
+            'Новое название',
+            [{'name': genres[1]['name'], 'slug': genres[1]['slug']}],
+            categories[1],
+        ), f'Проверьте, что `{url}` изменяет произведения с указанным `id`.'
+
+        response = admin_client.post(url, data={}, format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        item = {**make_batch(1)[0], 'id': created[0]['id']}
+        response = admin_client.post(url, data=[item, item], format='json')
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            f'Проверьте, что `{url}` отклоняет пакет, в котором один `id` '
+            'указан дважды.'
+        )
+        errors = response.json()
+        assert not errors[0] and 'id' in errors[1]
+        for pk in (10 ** 23, -1, 0):
+            response = admin_client.post(
+                url, data=[{**item, 'id': pk}], format='json'
+            )
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что `{url}` отклоняет `id` вне допустимого '
+                'диапазона.'
+            )
+            assert 'id' in response.json()[0]
+
+    def test_17_titles_slug_lookups_cached(self, client, admin_client,
+                                           settings):
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        data = {
+            'name': 'Чужой',
+            'year': 1979,
+            'genre': [genres[0]['slug'], genres[1]['slug']],
+            'category': categories[0]['slug'],
+        }
+        with CaptureQueriesContext(connection) as captured:
+            response = admin_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.CREATED
+        slug_queries = [
+            query['sql'] for query in captured.captured_queries
+            if '"slug" =' in query['sql'] or '"slug" IN' in query['sql']
+        ]
+        assert not slug_queries, (
+            f'Проверьте, что POST-запрос к `{url}` ищет категорию и жанры '
+            'по слагу без запросов к базе данных.'
+        )
+
+        response = admin_client.post(
+            '/api/v1/genres/', data={'name': 'Фантастика', 'slug': 'sci-fi'}
+        )
+        data['genre'] = ['sci-fi']
+        response = admin_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что новый жанр сразу доступен при создании '
+            'произведения.'
+        )
+        response = client.get(url, {'genre': 'sci-fi'})
+        assert response.json()['count'] == 1
+
+        admin_client.delete(f'/api/v1/categories/{categories[1]["slug"]}/')
+        response = client.get(url, {'category': categories[1]['slug']})
+        assert response.json()['count'] == 0
+        response = admin_client.post(url, data={
+            **data, 'category': categories[1]['slug']
+        })
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что удалённая категория недоступна при создании '
+            'произведения.'
+        )
+        assert 'category' in response.json()
+
+        # Записи, созданные другим процессом: сигналы здесь не приходят.
+        from reviews.models import Category, Genre, Title
+
+        Category.objects.bulk_create([Category(name='Аниме', slug='anime')])
+        response = admin_client.post(url, data={**data, 'category': 'anime'})
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что слаг, которого нет в словаре процесса, '
+            'ищется в базе данных.'
+        )
+        assert client.get(url, {'category': 'anime'}).json()['count'] == 1
+
+        def noir_ids():
+            # Без кэша ответов и числа записей.
+            response = admin_client.get(url, {'genre': 'noir', 'count': 0})
+            return [title['id'] for title in response.json()['results']]
+
+        Genre.objects.bulk_create([Genre(name='Нуар', slug='noir')])
+        assert noir_ids() == []
+        title_id = response.json()['id']
+        Title.genre.through.objects.bulk_create([Title.genre.through(
+            title_id=title_id, genre_id=Genre.objects.get(slug='noir').pk,
+        )])
+        assert noir_ids() == [], (
+            'Проверьте, что индекс жанров в памяти процесса не '
+            'перестраивается, пока версия не изменилась.'
+        )
+        # Другой процесс увеличивает версию в базе данных.
+        from api.v1.cache import bump_versions
+        from api.v1.postings import POSTINGS_VERSION
+
+        settings.API_VERSIONS_MAX_AGE = 0
+        bump_versions((POSTINGS_VERSION,))
+        assert noir_ids() == [title_id], (
+            'Проверьте, что индекс жанров в памяти процесса перестраивается '
+            'после изменения версии в базе данных.'
+        )
+
+    def test_18_titles_estimated_count(self, client, admin_client, settings):
+        settings.API_COUNT_ESTIMATE_THRESHOLD = 2
+        titles, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        assert client.get(url).json()['count'] == 2
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        admin_client.post(url, data={
+            'name': 'Чужой',
+            'year': 1979,
+            'genre': [genres[0]['slug']],
+            'category': categories[0]['slug'],
+        })
+
+        assert client.get(url).json()['count'] == 2, (
+            f'Проверьте, что для большой таблицы эндпоинт `{url}` без '
+            'фильтров возвращает оценку числа записей по статистике базы.'
+        )
+        response = client.get(url, {'category': categories[0]['slug']})
+        assert response.json()['count'] == 2, (
+            f'Проверьте, что с фильтрами эндпоинт `{url}` считает число '
+            'записей точно.'
+        )
+        # Статистика по нескольким строкам не должна влиять на планы
+        # запросов в следующих тестах.
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM sqlite_stat1')
+            cursor.execute('ANALYZE sqlite_master')
+
+    def test_19_titles_export(self, client, admin_client, user_client,
+                              settings):
+        settings.API_EXPORT_CHUNK_SIZE = 2
+        titles, categories, genres = create_titles(admin_client)
+        for idx in range(3):
+            admin_client.post('/api/v1/titles/', data={
+                'name': f'Произведение {idx}',
+                'year': 2000 + idx,
+                'genre': [genre['slug'] for genre in genres],
+                'category': categories[idx % 2]['slug'],
+            })
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 8)
+        url = '/api/v1/titles/export/'
+
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{url}` доступен без авторизации.'
+        )
+        exported = read_ndjson(response)
+        listed = client.get('/api/v1/titles/', {'limit': 100}).json()
+        assert exported == sorted(
+            listed['results'], key=lambda title: title['id']
+        ), (
+            f'Проверьте, что эндпоинт `{url}` выгружает все произведения '
+            'с жанрами, категорией и рейтингом, по одному в строке.'
+        )
+        assert exported[0]['rating'] == 8
+
+        response = client.get(url, {'category': categories[1]['slug']})
+        assert {title['category']['slug'] for title in read_ndjson(
+            response
+        )} == {categories[1]['slug']}, (
+            f'Проверьте, что эндпоинт `{url}` поддерживает фильтры списка '
+            'произведений.'
+        )
+
+    def test_20_titles_fast_json_renderer(self, client, admin_client,
+                                          user_client):
+        import datetime as dt
+        from decimal import Decimal
+
+        from rest_framework.renderers import JSONRenderer
+
+        from api.v1.renderers import FastJSONRenderer
+
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 7)
+        for url in (
+            '/api/v1/titles/',
+            f'/api/v1/titles/{titles[0]["id"]}/',
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/',
+        ):
+            response = client.get(url)
+            assert response.content == JSONRenderer().render(
+                response.data
+            ), (
+                f'Проверьте, что ответ `{url}` совпадает побайтно с выводом '
+                'JSONRenderer.'
+            )
+
+        data = {
+            'text': 'Строка\u2028с разделителем\u2029',
+            'date': dt.date(2020, 1, 2),
+            'time': dt.datetime(2020, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc),
+            'decimal': Decimal('1.50'),
+            'floats': [0.1, 2.5e-05, 1e16, 7.333333333333333],
+            'big': 2 ** 70,
+            1: None,
+        }
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(
+            data
+        ), 'Проверьте, что FastJSONRenderer совпадает с JSONRenderer.'
+        assert FastJSONRenderer().render(
+            data, 'application/json; indent=2'
+        ) == JSONRenderer().render(data, 'application/json; indent=2')
+
+    def test_21_titles_msgpack(self, client, admin_client):
+        from api.v1.messagepack import packb, unpackb
+
+        _, categories, genres = create_titles(admin_client)
+        url = '/api/v1/titles/'
+        response = client.get(url, HTTP_ACCEPT='application/msgpack')
+        assert response.status_code == HTTPStatus.OK
+        assert response['Content-Type'] == 'application/msgpack', (
+            f'Проверьте, что `{url}` отдаёт MessagePack при '
+            '`Accept: application/msgpack`.'
+        )
+        assert unpackb(response.content) == client.get(url).json(), (
+            'Проверьте, что ответ в MessagePack совпадает по структуре '
+            'с JSON.'
+        )
+
+        data = {
+            'name': 'Поворот туда',
+            'year': 2000,
+            'genre': [genres[0]['slug']],
+            'category': categories[0]['slug'],
+        }
+        response = admin_client.post(
+            url, data=packb(data), content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Проверьте, что `{url}` принимает тело запроса в MessagePack.'
+        )
+        assert unpackb(response.content)['name'] == data['name']
+        response = admin_client.post(
+            url, data=b'\xc1', content_type='application/msgpack'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+        assert packb({'a': [1, -1, None, True]}) == (
+            b'\x81\xa1a\x94\x01\xff\xc0\xc3'
+        )
+        values = [
+            0, 127, 128, 255, 256, 65535, 65536, 2 ** 32, 2 ** 64 - 1,
+            -32, -33, -128, -129, -32768, -32769, -2 ** 31 - 1, -2 ** 63,
+            0.5, 'я' * 40, 'я' * 200, 'x' * 70000, b'\x00' * 300,
+            list(range(20)), {str(idx): idx for idx in range(20)},
+        ]
+        assert unpackb(packb(values)) == values
+
+    def test_22_titles_compression(self, client, admin_client, settings,
+                                   monkeypatch):
+        import gzip
+
+        from api.v1 import cache as response_cache
+
+        settings.API_COMPRESSION_MIN_SIZE = 200
+        create_titles(admin_client)
+        url = '/api/v1/titles/'
+        plain = client.get(url, HTTP_ACCEPT_ENCODING='identity')
+        assert not plain.has_header('Content-Encoding')
+
+        calls = []
+        compress_content = response_cache.compress_content
+
+        def counting_compress(*args):
+            calls.append(args[1])
+            return compress_content(*args)
+
+        monkeypatch.setattr(
+            response_cache, 'compress_content', counting_compress
+        )
+        for _ in range(3):
+            response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+            assert response['Content-Encoding'] == 'gzip', (
+                f'Проверьте, что ответ `{url}` сжимается gzip, если клиент '
+                'его принимает.'
+            )
+            assert gzip.decompress(response.content) == plain.content
+            assert 'Accept-Encoding' in response['Vary']
+            assert response['ETag'] == 'W/' + plain['ETag']
+            assert response['Content-Length'] == str(len(response.content))
+        assert calls == ['gzip'], (
+            'Проверьте, что сжатый вариант ответа хранится в кэше и не '
+            'сжимается заново.'
+        )
+        response = client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+        response = admin_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        assert gzip.decompress(response.content) == plain.content, (
+            'Проверьте, что сжимаются и ответы, не попадающие в кэш.'
+        )
+        response = client.get(
+            f'{url}?limit=1&fields=id', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        assert not response.has_header('Content-Encoding'), (
+            'Проверьте, что ответы меньше API_COMPRESSION_MIN_SIZE не '
+            'сжимаются.'
+        )
+        response = client.get(
+            f'{url}export/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        assert response['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(
+            b''.join(response.streaming_content)
+        ) == b''.join(client.get(f'{url}export/').streaming_content), (
+            'Проверьте, что потоковая выгрузка сжимается.'
+        )
+
+    def test_23_titles_score_distribution(self, client, admin_client, admin,
+                                          user_client, moderator_client):
+        from reviews.models import ScoreHistogram
+
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/{title_id}/'
+        empty = {str(score): 0 for score in range(1, 11)}
+        assert client.get(url).json()['score_distribution'] == empty, (
+            f'Проверьте, что ответ `{url}` содержит `score_distribution` '
+            'с нулями для произведения без отзывов.'
+        )
+
+        create_single_review(user_client, title_id, 'Отлично', 9)
+        response = create_single_review(
+            moderator_client, title_id, 'Неплохо', 7
+        )
+        create_single_review(admin_client, title_id, 'Тоже', 9)
+        expected = dict(empty, **{'9': 2, '7': 1})
+        assert client.get(url).json()['score_distribution'] == expected, (
+            'Проверьте, что распределение оценок обновляется при создании '
+            'отзывов.'
+        )
+
+        review_url = f'{url}reviews/{response.json()["id"]}/'
+        moderator_client.patch(review_url, data={'score': 3})
+        expected = dict(empty, **{'9': 2, '3': 1})
+        assert client.get(url).json()['score_distribution'] == expected, (
+            'Проверьте, что распределение оценок обновляется при изменении '
+            'оценки отзыва.'
+        )
+        moderator_client.delete(review_url)
+        expected = dict(empty, **{'9': 2})
+        assert client.get(url).json()['score_distribution'] == expected, (
+            'Проверьте, что распределение оценок обновляется при удалении '
+            'отзыва.'
+        )
+        assert 'score_distribution' not in client.get(
+            '/api/v1/titles/'
+        ).json()['results'][0]
+
+        ScoreHistogram.objects.all().delete()
+        cache.clear()
+        response = client.get(url)
+        assert response.json()['score_distribution'] == empty
+        etag = response['ETag']
+        out = StringIO()
+        call_command('rebuild_score_histograms', stdout=out)
+        assert '1' in out.getvalue()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после команды `rebuild_score_histograms` '
+            '`ETag` произведения меняется.'
+        )
+        assert response.json()['score_distribution'] == expected, (
+            'Проверьте, что команда `rebuild_score_histograms` '
+            'восстанавливает распределения оценок.'
+        )
+        assert client.get(url).json()['score_distribution'] == expected
+
+    @pytest.mark.skipif(
+        connection.vendor != 'sqlite', reason='План запроса SQLite'
+    )
+    def test_24_titles_search_plan(self):
+        from api.v1.filters import TitleFilter
+        from reviews.models import Title
+
+        plan = TitleFilter(
+            {'search': 'кот'}, queryset=Title.objects.all()
+        ).qs.explain()
+        assert 'reviews_title_fts VIRTUAL TABLE' in plan, (
+            'Проверьте, что полнотекстовый поиск использует индекс FTS5. '
+            f'План запроса: {plan}'
+        )
+        assert 'CORRELATED' not in plan, (
+            'Проверьте, что полнотекстовый поиск соединяется с таблицей '
+            'FTS5, а не выполняет MATCH в подзапросе для каждой строки. '
+            f'План запроса: {plan}'
+        )
+
+    def test_25_msgpack_fallback_default(self, monkeypatch):
+        from datetime import date
+        from decimal import Decimal
+
+        from api.v1 import messagepack
+
+        monkeypatch.setattr(messagepack, 'msgpack', None)
+
+        def default(value):
+            if isinstance(value, (set, frozenset)):
+                return sorted(value)
+            if isinstance(value, (date, Decimal)):
+                return str(value)
+            raise TypeError(type(value).__name__)
+
+        data = {
+            'days': {date(2020, 1, 2), date(2020, 1, 1)},
+            'prices': (Decimal('1.50'), [Decimal('2')]),
+        }
+        assert messagepack.unpackb(
+            messagepack.packb(data, default=default)
+        ) == {
+            'days': ['2020-01-01', '2020-01-02'],
+            'prices': ['1.50', ['2']],
+        }, (
+            'Проверьте, что кодировщик MessagePack на чистом Python '
+            'применяет `default` и к значениям, вложенным в результат '
+            '`default`.'
+        )
+        with pytest.raises(TypeError):
+            messagepack.packb({'value': object()}, default=lambda value: value)
+
+    def test_26_titles_top_plan(self, client, admin_client):
+        from django.test.utils import CaptureQueriesContext
+
+        _, categories, _ = create_titles(admin_client)
+        url = '/api/v1/titles/top/'
+        # План проверяется на статистике большого каталога: для таблиц
+        # из нескольких строк сортировка в памяти дешевле индекса.
+        # ANALYZE создаёт таблицу статистики, если её ещё нет.
+        stats = (
+            ('reviews_title', None, '100000'),
+            ('reviews_titleranking', None, '100000'),
+            ('reviews_titleranking', 'ranking_score_idx', '100000 1 1'),
+            (
+                'reviews_titleranking', 'ranking_category_score_idx',
+                '100000 10000 1 1'
+            ),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('DELETE FROM sqlite_stat1')
+            cursor.executemany(
+                'INSERT INTO sqlite_stat1 VALUES (%s, %s, %s)', stats
+            )
+            cursor.execute('ANALYZE sqlite_master')
+        for params in (
+            {'count': 'false'},
+            {'pagination': 'cursor'},
+            {'pagination': 'cursor', 'category': categories[0]['slug']},
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            assert response.status_code == HTTPStatus.OK
+            sql = queries.captured_queries[-1]['sql']
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            assert 'ranking_' in plan and 'TEMP B-TREE' not in plan, (
+                f'Проверьте, что страница `{url}` с параметрами {params} '
+                'упорядочена по индексу рейтинга без дополнительной '
+                f'сортировки. План запроса: {plan}'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM sqlite_stat1')
+            cursor.execute('ANALYZE sqlite_master')
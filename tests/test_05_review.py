@@ -4,7 +4,8 @@ import pytest
 from django.db.utils import IntegrityError
 
 from tests.utils import (check_fields, check_pagination, create_reviews,
-                         create_single_review, create_titles)
+                         create_single_review, create_titles, make_cursor,
+                         read_ndjson)
 
 
 @pytest.mark.django_db(transaction=True)
@@ -384,3 +385,422 @@ class Test05ReviewAPI:
                 f'Проверьте, что DELETE-запрос {role} к чужому отзыву через '
                 f'`{url_template}` удаляет отзыв.'
             )
+
+    def test_06_review_changes_update_rating(self, admin_client, admin, user,
+                                             user_client, moderator,
+                                             moderator_client):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        review_url = title_url + 'reviews/{review_id}/'
+
+        def get_rating():
+            return admin_client.get(title_url).json().get('rating')
+
+        assert get_rating() == 5, (
+            'Проверьте, что после создания отзывов рейтинг произведения '
+            'равен средней оценке.'
+        )
+
+        user_client.patch(
+            review_url.format(review_id=reviews[1]['id']), data={'score': 10}
+        )
+        assert get_rating() == 6, (
+            'Проверьте, что при изменении оценки в отзыве рейтинг '
+            'произведения пересчитывается.'
+        )
+
+        admin_client.delete(review_url.format(review_id=reviews[0]['id']))
+        assert get_rating() == 7, (
+            'Проверьте, что при удалении отзыва рейтинг произведения '
+            'пересчитывается.'
+        )
+
+        for review in reviews[1:]:
+            admin_client.delete(review_url.format(review_id=review['id']))
+        assert get_rating() is None, (
+            'Проверьте, что после удаления всех отзывов значением поля '
+            '`rating` становится `None`.'
+        )
+
+    def test_07_reviews_cursor_pagination(self, client, admin_client, admin,
+                                          user, user_client, moderator,
+                                          moderator_client):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        data = client.get(f'{url}?pagination=cursor&limit=1').json()
+        walked = [review['id'] for review in data['results']]
+        while data['next']:
+            data = client.get(data['next']).json()
+            walked.extend(review['id'] for review in data['results'])
+        assert walked == [review['id'] for review in reviews], (
+            'Проверьте, что курсорная пагинация '
+            '`/api/v1/titles/{title_id}/reviews/` возвращает отзывы в '
+            'порядке публикации без повторов и пропусков.'
+        )
+
+        for position in (['not a date', 1], ['2023-02-30T00:00:00', 1]):
+            response = client.get(url, {'cursor': make_cursor(position)})
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Проверьте, что курсор с некорректной датой в запросе к '
+                '`/api/v1/titles/{title_id}/reviews/` возвращает ответ со '
+                'статусом 404.'
+            )
+
+    def test_08_reviews_sparse_fieldsets(self, client, admin_client, admin,
+                                         user, user_client):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        response = client.get(url, {'fields': 'id,score'})
+        assert [set(review) for review in response.json()['results']] == [
+            {'id', 'score'}, {'id', 'score'}
+        ], (
+            'Проверьте, что параметр `fields` эндпоинта '
+            '`/api/v1/titles/{title_id}/reviews/` оставляет в ответе только '
+            'перечисленные поля.'
+        )
+
+    def test_09_reviews_count(self, client, admin_client, admin, user,
+                              user_client, moderator, moderator_client,
+                              django_assert_num_queries):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+
+        assert client.get(url).json()['count'] == 2
+        with django_assert_num_queries(2):
+            response = client.get(url, {'limit': 1, 'offset': 1})
+        assert response.json()['count'] == 2, (
+            f'Проверьте, что число отзывов на `{url}` берётся из кэша.'
+        )
+        create_single_review(moderator_client, titles[0]['id'], 'Новый', 3)
+        assert client.get(url).json()['count'] == 3, (
+            f'Проверьте, что кэш числа отзывов на `{url}` сбрасывается '
+            'при добавлении отзыва.'
+        )
+
+        with django_assert_num_queries(2):
+            response = client.get(url, {'limit': 2, 'count': 'false'})
+        data = response.json()
+        assert 'count' not in data and len(data['results']) == 2, (
+            f'Проверьте, что с параметром `count=false` эндпоинт `{url}` '
+            'не считает число отзывов.'
+        )
+        assert data['previous'] is None
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 1 and data['next'] is None
+        assert data['previous']
+
+    def test_10_reviews_export(self, client, admin_client, admin, user,
+                               user_client):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        create_single_review(user_client, titles[1]['id'], 'Другой', 2)
+        url = '/api/v1/reviews/export/'
+
+        exported = read_ndjson(client.get(url))
+        assert len(exported) == 3, (
+            f'Проверьте, что эндпоинт `{url}` выгружает все отзывы.'
+        )
+        response = client.get(url, {'title': titles[0]['id']})
+        listed = client.get(
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        ).json()['results']
+        assert read_ndjson(response) == listed, (
+            f'Проверьте, что эндпоинт `{url}` фильтрует отзывы по '
+            'параметру `title`.'
+        )
+        response = client.get(url, {'title': 'abc'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        for title_id in ('²', '0', '9' * 23):
+            response = client.get(url, {'title': title_id})
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что эндпоинт `{url}` отклоняет некорректный '
+                f'id произведения до начала выгрузки: {title_id}.'
+            )
+
+    def test_11_reviews_msgpack(self, client, admin_client, admin, user,
+                                user_client):
+        from api.v1.messagepack import packb, unpackb
+
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+        response = user_client.post(
+            url, data=packb({'text': 'Коротко', 'score': 6}),
+            content_type='application/msgpack',
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            f'Проверьте, что `{url}` принимает тело запроса в MessagePack.'
+        )
+        response = client.get(url, {'format': 'msgpack'})
+        assert response['Content-Type'] == 'application/msgpack'
+        data = unpackb(response.content)
+        assert data == client.get(url).json(), (
+            'Проверьте, что ответ в MessagePack совпадает по структуре '
+            'с JSON.'
+        )
+        assert data['results'][0]['pub_date'].endswith('Z')
+
+        for body in (b'\x91' * 5000 + b'\xc0', b'\xc1', b'\x92\x01'):
+            response = user_client.post(
+                url, data=body, content_type='application/msgpack'
+            )
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                'Проверьте, что некорректное тело в MessagePack, в том '
+                'числе слишком глубоко вложенное, возвращает ответ 400.'
+            )
+
+    def test_12_reviews_duplicate_single_query(self, admin_client, admin,
+                                               user, user_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        url = f'/api/v1/titles/{titles[1]["id"]}/reviews/'
+        with CaptureQueriesContext(connection) as queries:
+            create_single_review(user_client, titles[1]['id'], 'Пойдёт', 5)
+        statements = [query['sql'] for query in queries.captured_queries]
+        insert = next(
+            index for index, sql in enumerate(statements)
+            if sql.startswith('INSERT INTO "reviews_review"')
+        )
+        before = [
+            sql for sql in statements[:insert] if sql.startswith('SELECT')
+        ]
+        assert len(before) == 2 and not any(
+            'FROM "reviews_review"' in sql for sql in before
+        ), (
+            'Проверьте, что перед созданием отзыва запрашиваются только '
+            'пользователь и произведение (по одному разу), а повторный '
+            'отзыв отклоняется ограничением уникальности. Запросы: '
+            f'{before}'
+        )
+
+        response = user_client.post(url, data={'text': 'Ещё', 'score': 6})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {
+            'non_field_errors': ['Может существовать только один отзыв']
+        }, (
+            'Проверьте, что при повторном отзыве возвращается прежнее '
+            'описание ошибки.'
+        )
+
+    @pytest.mark.parametrize('fast', (True, False))
+    def test_13_reviews_list_query_budget(self, fast, admin_client, admin,
+                                          user, user_client, moderator,
+                                          moderator_client, settings):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        settings.API_FAST_SERIALIZERS = fast
+        author_map = {
+            admin: admin_client, user: user_client,
+            moderator: moderator_client,
+        }
+        _, titles = create_reviews(admin_client, author_map)
+        create_single_review(user_client, titles[1]['id'], 'Один', 3)
+
+        counts = []
+        for title, expected in ((titles[1], 1), (titles[0], 3)):
+            url = f'/api/v1/titles/{title["id"]}/reviews/'
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get(url)
+            assert len(response.json()['results']) == expected
+            counts.append(len(queries))
+        assert counts[0] == counts[1] <= 4, (
+            'Проверьте, что число запросов к базе данных при получении '
+            'списка отзывов не зависит от числа отзывов (автор и '
+            f'произведение не загружаются для каждого отзыва): {counts}.'
+        )
+
+    def test_14_reviews_deferred_aggregates(self, client, admin_client,
+                                            admin, user, user_client,
+                                            moderator_client, settings,
+                                            monkeypatch):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from reviews.models import AggregateJob
+
+        settings.REVIEW_AGGREGATES_DEFERRED = True
+        # Версии моделей перечитываются из базы данных при каждом запросе.
+        settings.API_VERSIONS_MAX_AGE = 0
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        url = f'/api/v1/titles/{title_id}/'
+        assert client.get(url).json()['rating'] is None
+
+        create_single_review(user_client, title_id, 'Отлично', 9)
+        response = create_single_review(
+            moderator_client, title_id, 'Неплохо', 6
+        )
+        moderator_client.patch(
+            f'{url}reviews/{response.json()["id"]}/', data={'score': 5}
+        )
+        create_single_review(admin_client, titles[1]['id'], 'Так себе', 4)
+        assert AggregateJob.objects.count() == 4, (
+            'Проверьте, что при отложенном пересчёте каждая запись отзыва '
+            'добавляет задание в очередь.'
+        )
+        assert client.get(url).json()['rating'] is None, (
+            'Проверьте, что при отложенном пересчёте агрегаты не '
+            'обновляются при записи отзыва.'
+        )
+
+        # Команда работает в своём процессе, и её кэш не виден
+        # веб-серверу.
+        from django.core.cache.backends.locmem import LocMemCache
+
+        etags = {
+            endpoint: client.get(endpoint)['ETag']
+            for endpoint in (
+                '/api/v1/titles/', '/api/v1/titles/top/',
+                '/api/v1/categories/stats/',
+            )
+        }
+        out = StringIO()
+        with monkeypatch.context() as patch:
+            patch.setattr(
+                'api.v1.cache.cache', LocMemCache('aggregates_worker', {})
+            )
+            call_command('aggregates_worker', '--once', stdout=out)
+        for endpoint, etag in etags.items():
+            response = client.get(endpoint, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что после прохода `aggregates_worker` `ETag` '
+                f'ответа `{endpoint}` меняется во всех процессах.'
+            )
+        assert 'пересчитаны: 2 ' in out.getvalue(), (
+            'Проверьте, что задания одного произведения объединяются.'
+        )
+        assert not AggregateJob.objects.exists()
+        detail = client.get(url).json()
+        assert detail['rating'] == 7, (
+            'Проверьте, что команда `aggregates_worker` пересчитывает '
+            'рейтинг, а кэш ответов после неё сбрасывается.'
+        )
+        assert detail['score_distribution']['9'] == 1
+        assert detail['score_distribution']['5'] == 1
+        top = client.get('/api/v1/titles/top/').json()['results']
+        assert [title['id'] for title in top] == [
+            title_id, titles[1]['id']
+        ]
+
+        admin_client.delete(url)
+        call_command('aggregates_worker', '--once', stdout=StringIO())
+        assert [
+            title['id'] for title in
+            client.get('/api/v1/titles/top/').json()['results']
+        ] == [titles[1]['id']], (
+            'Проверьте, что после удаления произведения оно исчезает из '
+            'рейтинга.'
+        )
+
+    def test_15_reviews_list_uses_composite_index(self, client, admin_client,
+                                                  admin, user_client,
+                                                  moderator_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from reviews.models import Comment, Review
+
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        review_id = create_single_review(
+            user_client, title_id, 'Отлично', 9
+        ).json()['id']
+        create_single_review(moderator_client, title_id, 'Неплохо', 6)
+        # Комментарии с одинаковой датой упорядочиваются по id.
+        review = Review.objects.get(pk=review_id)
+        comments = Comment.objects.bulk_create(
+            Comment(review=review, author=admin, text=f'Ответ {idx}')
+            for idx in range(3)
+        )
+        Comment.objects.filter(review=review).update(
+            pub_date=review.pub_date
+        )
+
+        for url, index in (
+            (
+                f'/api/v1/titles/{title_id}/reviews/',
+                'review_title_pub_date_idx'
+            ),
+            (
+                f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/',
+                'comment_review_pub_date_idx'
+            ),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, {'limit': 10, 'count': 'false'})
+            assert response.status_code == HTTPStatus.OK
+            sql = queries.captured_queries[-1]['sql']
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            assert index in plan, (
+                f'Проверьте, что страница `{url}` выбирается по индексу '
+                f'{index}. План запроса: {plan}'
+            )
+            assert 'TEMP B-TREE' not in plan, (
+                f'Проверьте, что страница `{url}` не сортируется отдельно '
+                f'от чтения индекса. План запроса: {plan}'
+            )
+
+        assert [
+            comment['text'] for comment in response.json()['results']
+        ] == [comment.text for comment in comments], (
+            'Проверьте, что комментарии с одинаковой датой публикации '
+            'упорядочены по id.'
+        )
+
+    def test_16_review_stale_instance_score_delta(self, admin_client,
+                                                  user_client):
+        from reviews.models import Review, ScoreHistogram, Title
+
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        review_id = create_single_review(
+            user_client, title_id, 'Отлично', 5
+        ).json()['id']
+        # Два запроса загрузили отзыв с оценкой 5 до того, как любой из
+        # них записал свою.
+        first = Review.objects.get(pk=review_id)
+        second = Review.objects.get(pk=review_id)
+        first.score = 7
+        first.save()
+        second.score = 9
+        second.save()
+
+        title = Title.objects.get(pk=title_id)
+        assert (title.rating_sum, title.review_count, title.rating) == (
+            9, 1, 9
+        ), (
+            'Проверьте, что разница оценок при изменении отзыва считается '
+            'от оценки, перечитанной в транзакции сохранения, а не от '
+            'загруженной ранее.'
+        )
+        histogram = ScoreHistogram.objects.get(title_id=title_id)
+        assert (histogram.score_5, histogram.score_7, histogram.score_9) == (
+            0, 0, 1
+        ), (
+            'Проверьте, что гистограмма оценок не расходится с отзывами '
+            'после параллельных изменений оценки.'
+        )
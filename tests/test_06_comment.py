@@ -3,7 +3,7 @@ from http import HTTPStatus
 import pytest
 
 from tests.utils import (check_fields, check_pagination, create_comments,
-                         create_reviews, create_single_comment)
+                         create_reviews, create_single_comment, read_ndjson)
 
 
 @pytest.mark.django_db(transaction=True)
@@ -381,3 +381,62 @@ class Test06CommentAPI:
             'Проверьте, что DELETE-запрос неавторизованного пользователя к '
             f'`{url}` возвращает ответ со статусом 401.'
         )
+
+    def test_07_comments_export(self, client, admin_client, admin, user,
+                                user_client):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        url = '/api/v1/comments/export/'
+
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Проверьте, что эндпоинт `{url}` доступен без авторизации.'
+        )
+        exported = read_ndjson(response)
+        assert [comment['id'] for comment in exported] == [
+            comment['id'] for comment in comments
+        ], f'Проверьте, что эндпоинт `{url}` выгружает все комментарии.'
+        assert exported[0]['review'] == reviews[0]['text']
+        assert read_ndjson(client.get(url, {'title': titles[1]['id']})) == [], (
+            f'Проверьте, что эндпоинт `{url}` фильтрует комментарии по '
+            'параметру `title`.'
+        )
+        for title_id in ('²', '0', '9' * 23):
+            response = client.get(url, {'title': title_id})
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                f'Проверьте, что эндпоинт `{url}` отклоняет некорректный '
+                f'id произведения до начала выгрузки: {title_id}.'
+            )
+
+    @pytest.mark.parametrize('fast', (True, False))
+    def test_08_comments_list_query_budget(self, fast, admin_client, admin,
+                                           user, user_client, moderator,
+                                           moderator_client, settings):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        settings.API_FAST_SERIALIZERS = fast
+        author_map = {
+            admin: admin_client, user: user_client,
+            moderator: moderator_client,
+        }
+        _, reviews, titles = create_comments(admin_client, author_map)
+        create_single_comment(
+            user_client, titles[0]['id'], reviews[1]['id'], 'Один'
+        )
+
+        counts = []
+        for review, expected in ((reviews[1], 1), (reviews[0], 3)):
+            url = (
+                f'/api/v1/titles/{titles[0]["id"]}/reviews/{review["id"]}/'
+                'comments/'
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get(url)
+            assert len(response.json()['results']) == expected
+            counts.append(len(queries))
+        assert counts[0] == counts[1] <= 4, (
+            'Проверьте, что число запросов к базе данных при получении '
+            'списка комментариев не зависит от числа комментариев (автор '
+            f'и отзыв не загружаются для каждого комментария): {counts}.'
+        )
@@ -0,0 +1,71 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_comments, create_single_review
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08FastSerializers:
+
+    @pytest.fixture
+    def catalog(self, admin_client, admin, user_client, user,
+                moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        create_single_review(user_client, titles[1]['id'], 'Так себе', 3)
+        admin_client.post('/api/v1/titles/', data={
+            'name': 'Без жанра',
+            'year': 1984,
+            'category': 'books',
+        })
+        admin_client.delete('/api/v1/categories/films/')
+        return titles, reviews
+
+    def get_both(self, client, settings, url):
+        settings.API_FAST_SERIALIZERS = False
+        expected = client.get(url)
+        settings.API_FAST_SERIALIZERS = True
+        response = client.get(url)
+        return expected, response
+
+    def test_01_fast_lists_match_model_serializers(self, admin_client,
+                                                   settings, catalog):
+        titles, reviews = catalog
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        urls = (
+            '/api/v1/categories/',
+            '/api/v1/genres/?search=ма',
+            '/api/v1/titles/',
+            '/api/v1/titles/?limit=2&offset=1',
+            '/api/v1/titles/?ordering=name',
+            '/api/v1/titles/?genre=comedy,drama',
+            '/api/v1/titles/?search=терминатор',
+            '/api/v1/titles/?fields=id,genre,category',
+            '/api/v1/titles/?omit=description,rating',
+            '/api/v1/titles/?pagination=cursor&limit=2',
+            reviews_url,
+            f'{reviews_url}?fields=author,pub_date',
+            f'{reviews_url}?pagination=cursor&limit=2',
+            f'{reviews_url}{reviews[0]["id"]}/comments/',
+            f'{reviews_url}{reviews[0]["id"]}/comments/?omit=review',
+        )
+        for url in urls:
+            expected, response = self.get_both(admin_client, settings, url)
+            assert expected.status_code == HTTPStatus.OK
+            assert response.content == expected.content, (
+                f'Проверьте, что быстрый сериализатор для `{url}` '
+                'возвращает тот же ответ, что и ModelSerializer.'
+            )
+
+    def test_02_fast_cursor_links_match(self, admin_client, settings,
+                                        catalog):
+        url = '/api/v1/titles/?pagination=cursor&limit=1&ordering=name'
+        for _ in range(3):
+            expected, response = self.get_both(admin_client, settings, url)
+            assert response.content == expected.content
+            url = response.json()['next']
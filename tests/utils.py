@@ -1,3 +1,5 @@
+import base64
+import json
 from http import HTTPStatus
 
 
@@ -305,3 +307,19 @@ def check_fields(obj_type, url_pattern, obj, expected_data, detail=False):
         f'данные {obj_types[obj_type]}{results_in_msg}. Поле `id` не '
         'найдено или не является целым числом.'
     )
+
+
+def read_ndjson(response):
+    assert response.streaming, (
+        'Проверьте, что выгрузка отдаётся потоком (StreamingHttpResponse).'
+    )
+    assert response['Content-Type'].startswith('application/x-ndjson'), (
+        'Проверьте, что выгрузка отдаётся в формате `application/x-ndjson`.'
+    )
+    content = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in content.splitlines()]
+
+
+def make_cursor(position, reverse=False):
+    data = json.dumps([int(reverse), position])
+    return base64.urlsafe_b64encode(data.encode()).decode()